@@ -3,17 +3,18 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from dotenv import load_dotenv
-from agent.config import config
-from agent.vector_store.factory import VectorStoreFactory
-
-load_dotenv()
 
 def check_data():
     """检查数据库中的数据"""
-    vector_store = VectorStoreFactory.create_vector_store()
-    vector_store.initialize()
-    
+    # 延迟导入：agent.* 会拉起langchain等重依赖，放在函数内可加快CLI启动
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from agent.config import config
+    from agent.vector_store.factory import get_vector_store
+
+    vector_store = get_vector_store()
+
     # 获取集合信息
     info = vector_store.get_collection_info()
     print(f"Collection info: {info}")
@@ -8,7 +8,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class VectorDBConfig:
     """向量数据库配置"""
     db_type: Literal["qdrant", "milvus", "weaviate"]
@@ -20,9 +20,20 @@ class VectorDBConfig:
     # 高可用配置
     backup_hosts: Optional[list] = None
     enable_replication: bool = False
-
-
-@dataclass
+    # 读对冲：检索并发打主库+备份，取先成功者（读放大换尾延迟）
+    enable_hedging: bool = False
+    # 向量量化（int8标量量化约4倍省内存，检索为内存带宽瓶颈时收益明显）
+    quantization: Literal["none", "int8"] = "none"
+    # 写入批大小与是否每次写入后强制flush（flush会封存WAL/段，代价高）
+    insert_batch_size: int = 1000
+    auto_flush: bool = False
+    # 写入并行worker数（Qdrant upload_points按此分摊批次）
+    upload_parallel: int = 4
+    # gRPC端口（Weaviate v4：insert_many/near_vector走gRPC而非REST）
+    grpc_port: int = 50051
+
+
+@dataclass(frozen=True, slots=True)
 class LLMConfig:
     """LLM配置"""
     model_name: str = "gpt-4o"
@@ -33,7 +44,7 @@ class LLMConfig:
     api_key: Optional[str] = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class EmbeddingConfig:
     """嵌入模型配置"""
     model_name: str = "text-embedding-3-small"
@@ -41,7 +52,7 @@ class EmbeddingConfig:
     timeout: int = 30
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class DataProcessingConfig:
     """数据处理配置"""
     chunk_size: int = 1000
@@ -52,7 +63,7 @@ class DataProcessingConfig:
     max_chunk_size: int = 2000
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class RAGConfig:
     """RAG配置"""
     top_k: int = 5
@@ -61,6 +72,8 @@ class RAGConfig:
     max_iterations: int = 3
     enable_reflection: bool = True
     enable_iteration: bool = True
+    max_concurrency: int = 16  # 批量调用时同时在跑的图实例上限
+    max_chunk_chars: int = 1200  # 单个文档块进入生成提示词的字符上限
 
 
 class Config:
@@ -96,6 +109,10 @@ class Config:
                 api_key=os.getenv("QDRANT_API_KEY"),
                 backup_hosts=backup_hosts,
                 enable_replication=os.getenv("QDRANT_REPLICATION", "false").lower() == "true",
+                enable_hedging=os.getenv("VECTOR_DB_HEDGING", "false").lower() == "true",
+                quantization=os.getenv("VECTOR_DB_QUANTIZATION", "none"),
+                insert_batch_size=int(os.getenv("QDRANT_UPLOAD_BATCH_SIZE", "256")),
+                upload_parallel=int(os.getenv("QDRANT_UPLOAD_PARALLEL", "4")),
             )
         elif db_type == "milvus":
             self.vector_db = VectorDBConfig(
@@ -104,6 +121,8 @@ class Config:
                 port=int(os.getenv("MILVUS_PORT", "19530")),
                 collection_name=os.getenv("MILVUS_COLLECTION", "financial_docs"),
                 api_key=os.getenv("MILVUS_API_KEY"),
+                insert_batch_size=int(os.getenv("MILVUS_INSERT_BATCH_SIZE", "1000")),
+                auto_flush=os.getenv("MILVUS_AUTO_FLUSH", "false").lower() == "true",
             )
         else:  # weaviate
             backup_hosts = os.getenv("WEAVIATE_BACKUP_HOSTS")
@@ -116,6 +135,8 @@ class Config:
                 api_key=os.getenv("WEAVIATE_API_KEY"),
                 backup_hosts=backup_hosts,
                 enable_replication=os.getenv("WEAVIATE_REPLICATION", "false").lower() == "true",
+                enable_hedging=os.getenv("VECTOR_DB_HEDGING", "false").lower() == "true",
+                grpc_port=int(os.getenv("WEAVIATE_GRPC_PORT", "50051")),
             )
         
         # 数据处理配置
@@ -131,6 +152,8 @@ class Config:
             rerank_top_k=int(os.getenv("RAG_RERANK_TOP_K", "3")),
             similarity_threshold=float(os.getenv("RAG_SIMILARITY_THRESHOLD", "0.4")),  # 默认0.4，平衡检索严格度和召回率
             max_iterations=int(os.getenv("RAG_MAX_ITERATIONS", "3")),
+            max_concurrency=int(os.getenv("RAG_MAX_CONCURRENCY", "16")),
+            max_chunk_chars=int(os.getenv("RAG_MAX_CHUNK_CHARS", "1200")),
         )
         
         # 其他配置
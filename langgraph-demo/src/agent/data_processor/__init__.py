@@ -1,12 +1,7 @@
 """数据处理模块 - 基于 deep-searcher loader 实现"""
 
-from agent.data_processor.file_loader import FileLoader, get_file_loader
 from agent.data_processor.text_splitter import TextSplitter, get_text_splitter
 
-# 保持向后兼容
-from agent.data_processor.file_manager import FileManager
-from agent.data_processor.chunker import chunk_documents
-
 __all__ = [
     "FileLoader",
     "get_file_loader",
@@ -17,3 +12,15 @@ __all__ = [
 ]
 
 
+def __getattr__(name):
+    """PEP 562 延迟导入：文件解析符号只在真正引用时才加载pandas等重依赖"""
+    if name in ("FileLoader", "get_file_loader"):
+        from agent.data_processor import file_loader
+        return getattr(file_loader, name)
+    if name == "FileManager":
+        from agent.data_processor.file_manager import FileManager
+        return FileManager
+    if name == "chunk_documents":
+        from agent.data_processor.chunker import chunk_documents
+        return chunk_documents
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -10,6 +10,51 @@ from agent.config import config
 
 logger = logging.getLogger(__name__)
 
+# 文本清理用正则，模块导入时编译一次
+# 控制字符与异常Unicode字符（零宽字符等）合并为一个字符类，单次扫描移除
+_CTRL_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f\u200b-\u200f\u202a-\u202e\u2060-\u206f\ufeff]')
+_WS_RE = re.compile(r'[ \t]+')        # 多个空格/制表符合并为一个空格
+_NL_RE = re.compile(r'\n{3,}')        # 多个换行符合并为两个
+_LINE_EDGE_RE = re.compile(r'[ \t]*\n[ \t]*')  # 行首行尾空白
+
+# 金融术语保护标记：使用私有区单字符作为哨兵，一次str.translate即可全部移除
+_TERM_OPEN = '\uE000'
+_TERM_CLOSE = '\uE001'
+_STRIP_TBL = {0xE000: None, 0xE001: None}
+
+
+def _build_splitter() -> RecursiveCharacterTextSplitter:
+    """根据当前配置构建分块器"""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=config.data_processing.chunk_size,
+        chunk_overlap=config.data_processing.chunk_overlap,
+        length_function=len,
+        separators=[
+            "\n\n",  # 段落
+            "\n",    # 换行
+            "。",    # 中文句号
+            "！",    # 中文感叹号
+            "？",    # 中文问号
+            ". ",    # 英文句号
+            "! ",    # 英文感叹号
+            "? ",    # 英文问号
+            "; ",    # 分号
+            ", ",    # 逗号
+            " ",     # 空格
+            "",      # 字符级
+        ],
+    )
+
+
+# 模块级共享分块器，导入时构建一次，所有FinancialChunker实例复用
+_SPLITTER = _build_splitter()
+
+
+def reset_splitter() -> None:
+    """重建共享分块器（测试中修改config后调用）"""
+    global _SPLITTER
+    _SPLITTER = _build_splitter()
+
 
 class FinancialChunker:
     """金融文档分块器
@@ -31,29 +76,19 @@ class FinancialChunker:
         r'IPO[^。]*。',
         r'[并|重]购[^。]*。',
     ]
-    
+
+    # 合并为单个正则，导入时编译一次，单次扫描即可匹配所有模式
+    _FIN_RE = re.compile("|".join(f"(?:{p})" for p in FINANCIAL_PATTERNS))
+
     def __init__(self):
         """初始化分块器"""
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.data_processing.chunk_size,
-            chunk_overlap=config.data_processing.chunk_overlap,
-            length_function=len,
-            separators=[
-                "\n\n",  # 段落
-                "\n",    # 换行
-                "。",    # 中文句号
-                "！",    # 中文感叹号
-                "？",    # 中文问号
-                ". ",    # 英文句号
-                "! ",    # 英文感叹号
-                "? ",    # 英文问号
-                "; ",    # 分号
-                ", ",    # 逗号
-                " ",     # 空格
-                "",      # 字符级
-            ],
-        )
-    
+        self.text_splitter = _SPLITTER
+        # 缓存配置值，避免热路径上的三级属性查找
+        self._chunk_size = config.data_processing.chunk_size
+        self._max_chunk = config.data_processing.max_chunk_size
+        self._min_chunk = config.data_processing.min_chunk_size
+        self._preserve = config.data_processing.preserve_financial_terms
+
     def _preserve_financial_terms(self, text: str) -> str:
         """保留金融术语完整性
         
@@ -63,23 +98,11 @@ class FinancialChunker:
         Returns:
             处理后的文本
         """
-        if not config.data_processing.preserve_financial_terms:
+        if not self._preserve:
             return text
-        
-        # 在金融术语前后添加特殊标记，防止被截断
-        processed_text = text
-        for pattern in self.FINANCIAL_PATTERNS:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                # 在匹配项前后添加保护标记
-                start, end = match.span()
-                processed_text = (
-                    processed_text[:start] +
-                    f"<FINANCIAL_TERM>{match.group()}</FINANCIAL_TERM>" +
-                    processed_text[end:]
-                )
-        
-        return processed_text
+
+        # 在金融术语前后添加单字符哨兵，防止被截断，且几乎不增加文本体积
+        return self._FIN_RE.sub(lambda m: f"{_TERM_OPEN}{m.group(0)}{_TERM_CLOSE}", text)
     
     def _split_text_smart(self, text: str) -> List[str]:
         """智能分块（改进版，避免乱码和截断）
@@ -99,27 +122,38 @@ class FinancialChunker:
         # 保留金融术语
         processed_text = self._preserve_financial_terms(cleaned_text)
         
-        # 使用LangChain的分块器
-        chunks = self.text_splitter.split_text(processed_text)
+        # 短文本（表格、简短文档很常见）直接作为单块，跳过递归分块器
+        if len(processed_text) <= self._chunk_size:
+            chunks = [processed_text]
+        else:
+            # 使用LangChain的分块器
+            chunks = self.text_splitter.split_text(processed_text)
         
-        # 清理保护标记并处理分块
+        # 清理保护标记并处理分块（配置值绑定到局部变量，减少循环内属性查找）
+        max_chunk = self._max_chunk
+        min_chunk = self._min_chunk
         cleaned_chunks = []
+        short_count = 0
         for chunk in chunks:
-            # 移除保护标记
-            cleaned_chunk = chunk.replace("<FINANCIAL_TERM>", "").replace("</FINANCIAL_TERM>", "")
-            
+            # 移除保护标记（translate是单次C级扫描）
+            cleaned_chunk = chunk.translate(_STRIP_TBL)
+
             # 再次清理
             cleaned_chunk = self._clean_text(cleaned_chunk)
-            
+
             # 过滤太短或太长的块
             chunk_len = len(cleaned_chunk.strip())
             if chunk_len > 0:
-                if chunk_len <= config.data_processing.max_chunk_size:
-                    # 如果块太短，记录警告但不丢弃（除非完全为空）
-                    if chunk_len < config.data_processing.min_chunk_size:
-                        logger.warning(f"块长度 {chunk_len} 小于最小长度 {config.data_processing.min_chunk_size}，但仍保留")
+                if chunk_len <= max_chunk:
+                    # 如果块太短，计数但不丢弃（除非完全为空）
+                    if chunk_len < min_chunk:
+                        short_count += 1
                     cleaned_chunks.append(cleaned_chunk.strip())
-        
+
+        # 短块警告汇总为一条日志，避免小块密集的文档刷屏
+        if short_count and logger.isEnabledFor(logging.WARNING):
+            logger.warning("%d 个块长度小于最小长度 %d，但仍保留", short_count, min_chunk)
+
         return cleaned_chunks
     
     def _clean_text(self, text: str) -> str:
@@ -131,23 +165,17 @@ class FinancialChunker:
         Returns:
             清理后的文本
         """
-        import re
-        
-        # 移除控制字符（除了换行符、制表符等常用字符）
+        # 移除控制字符和异常Unicode字符（零宽字符等），单次扫描
         # 保留：\n, \r, \t, 以及所有可打印字符
-        text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-        
-        # 移除异常的Unicode字符（如零宽字符）
-        text = re.sub(r'[\u200b-\u200f\u202a-\u202e\u2060-\u206f\ufeff]', '', text)
-        
+        text = _CTRL_RE.sub('', text)
+
         # 规范化空白字符
-        text = re.sub(r'[ \t]+', ' ', text)  # 多个空格/制表符合并为一个空格
-        text = re.sub(r'\n{3,}', '\n\n', text)  # 多个换行符合并为两个
-        
-        # 移除行首行尾空白
-        lines = [line.strip() for line in text.split('\n')]
-        text = '\n'.join(lines)
-        
+        text = _WS_RE.sub(' ', text)
+        text = _NL_RE.sub('\n\n', text)
+
+        # 移除行首行尾空白（单次sub代替split/strip/join）
+        text = _LINE_EDGE_RE.sub('\n', text)
+
         return text
     
     def chunk_document(
@@ -169,43 +197,46 @@ class FinancialChunker:
             分块列表，每个分块包含content和metadata
         """
         chunks = []
-        
-        # 处理文本内容
-        if content.get("text"):
-            text_chunks = self._split_text_smart(content["text"])
-            
+
+        # 公共元数据只构建一次，每个分块在其副本上补充差异字段
+        base_meta = {
+            "doc_id": doc_id,
+            "user_id": user_id,
+            "doc_type": doc_type,
+            "file_type": content.get("file_type", "unknown"),
+        }
+
+        # 处理文本内容（空白文本直接跳过清洗/分块流水线）
+        text = content.get("text")
+        if text and text.strip():
+            text_chunks = self._split_text_smart(text)
+
             for idx, chunk_text in enumerate(text_chunks):
+                metadata = base_meta.copy()
+                metadata["chunk_index"] = idx
+                metadata["chunk_type"] = "text"
                 chunks.append({
                     "content": chunk_text,
-                    "metadata": {
-                        "doc_id": doc_id,
-                        "user_id": user_id,
-                        "doc_type": doc_type,
-                        "chunk_index": idx,
-                        "chunk_type": "text",
-                        "file_type": content.get("file_type", "unknown"),
-                    },
+                    "metadata": metadata,
                 })
-        
+
         # 处理表格（单独作为分块）
-        if content.get("tables"):
-            text_chunks_count = len([c for c in chunks if c.get("metadata", {}).get("chunk_type") == "text"])
-            for idx, table in enumerate(content["tables"]):
+        tables = content.get("tables")
+        if tables:
+            # 此时chunks里只有文本块，无需重新过滤统计
+            text_chunks_count = len(chunks)
+            for idx, table in enumerate(tables):
                 # 将表格转换为文本表示
                 if isinstance(table.get("data"), list):
                     table_text = self._table_to_text(table["data"])
                     if table_text:
+                        metadata = base_meta.copy()
+                        metadata["chunk_index"] = text_chunks_count + idx
+                        metadata["chunk_type"] = "table"
+                        metadata["table_columns"] = table.get("columns", [])
                         chunks.append({
                             "content": table_text,
-                            "metadata": {
-                                "doc_id": doc_id,
-                                "user_id": user_id,
-                                "doc_type": doc_type,
-                                "chunk_index": text_chunks_count + idx,
-                                "chunk_type": "table",
-                                "file_type": content.get("file_type", "unknown"),
-                                "table_columns": table.get("columns", []),
-                            },
+                            "metadata": metadata,
                         })
         
         logger.info(f"文档 {doc_id} 被分为 {len(chunks)} 个块")
@@ -222,20 +253,20 @@ class FinancialChunker:
         """
         if not table_data:
             return ""
-        
-        text_lines = []
+
+        # 行类型判断提到循环外，join直接消费生成器，避免中间列表
         if isinstance(table_data[0], dict):
             # DataFrame格式
-            for row in table_data:
-                row_text = " | ".join([f"{k}: {v}" for k, v in row.items()])
-                text_lines.append(row_text)
-        else:
-            # 二维列表格式
-            for row in table_data:
-                if isinstance(row, list):
-                    text_lines.append(" | ".join([str(cell) for cell in row]))
-        
-        return "\n".join(text_lines)
+            return "\n".join(
+                " | ".join(f"{k}: {v}" for k, v in row.items())
+                for row in table_data
+            )
+        # 二维列表格式
+        return "\n".join(
+            " | ".join(map(str, row))
+            for row in table_data
+            if isinstance(row, list)
+        )
 
 
 # 全局分块器实例
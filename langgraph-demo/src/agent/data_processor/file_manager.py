@@ -1,14 +1,149 @@
 """统一文件管理器，支持多种文件格式的解析和处理"""
 
+import codecs
+import functools
+import hashlib
+import importlib
+import io
 import logging
-import chardet
-from typing import Dict, Any, Optional
+import mmap
+import multiprocessing
+import os
+import pickle
+import queue
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain, repeat
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from pathlib import Path
+
+import chardet
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=None)
+def _probe(module: str):
+    """探测可选依赖是否可用（结果缓存，重复调用不再重复import）"""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        return None
+
+
+# 每个工作进程一次处理的页数，摊薄重复打开PDF的成本
+_PDF_PAGE_BATCH = 8
+
+# 小于该大小的文本文件直接read()，mmap的系统调用开销反而不划算
+_MMAP_MIN_SIZE = 65536
+
+# WordprocessingML命名空间（DOCX表格的lxml XPath提取用）
+_WNS = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
+
+# 流式解析时预读队列的深度：限制同时驻留内存/页缓存的待解析文件数
+_PREFETCH_DEPTH = 4
+
+# 解析结果磁盘缓存目录，按文件内容哈希命名，重复摄取同一份文件时直接命中
+_PARSE_CACHE_DIR = Path(os.getenv("PARSE_CACHE_DIR", "data/parse_cache"))
+
+
+def _file_sha256(file_path: str) -> str:
+    """计算文件内容的SHA-256（内容相同、路径不同的文件共享缓存）"""
+    with open(file_path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+：在C层分块读取，可用时走OpenSSL的SHA-NI指令
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+        return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=128)
+def _cached_parse(digest: str, file_path: str, extract_tables: bool) -> Dict[str, Any]:
+    """按内容哈希读写解析缓存（进程内lru_cache + 磁盘pickle两层）
+
+    Args:
+        digest: 文件内容的SHA-256
+        file_path: 文件路径（缓存未命中时用于实际解析）
+        extract_tables: 是否提取表格（结果不同，参与缓存键）
+
+    Returns:
+        解析结果字典
+    """
+    cache_path = _PARSE_CACHE_DIR / f"{digest}-t{int(extract_tables)}.pkl.z"
+
+    if cache_path.exists():
+        try:
+            return pickle.loads(zlib.decompress(cache_path.read_bytes()))
+        except Exception as e:
+            logger.warning(f"解析缓存损坏，重新解析 {cache_path.name}: {e}")
+
+    result = FileManager._dispatch_parse(file_path, extract_tables)
+
+    try:
+        _PARSE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        payload = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), level=3)
+        # 先写临时文件再原子改名，避免并发进程读到半截缓存
+        fd, tmp_path = tempfile.mkstemp(dir=_PARSE_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.warning(f"写入解析缓存失败（不影响结果）: {e}")
+
+    return result
+
+
+def _extract_pdf_pages(
+    file_path: str,
+    page_indices: List[int],
+    extract_tables: bool = False
+) -> List[Tuple[int, Optional[str], list]]:
+    """提取PDF指定页的文本和原始表格（模块级函数，可被子进程pickle）
+
+    Args:
+        file_path: PDF文件路径
+        page_indices: 要提取的页索引列表
+        extract_tables: 是否提取表格（表格检测比取文本慢5-10倍，默认跳过）
+
+    Returns:
+        (页索引, 文本, 原始表格列表) 元组列表
+    """
+    import pdfplumber
+
+    results = []
+    with pdfplumber.open(file_path) as pdf:
+        for idx in page_indices:
+            page = pdf.pages[idx]
+            page_tables = page.extract_tables() if extract_tables else []
+            results.append((idx, page.extract_text(), page_tables))
+    return results
+
+
+def _parse_one(file_path: str) -> Dict[str, Any]:
+    """解析单个文件（模块级函数，可被子进程pickle）"""
+    return FileManager.parse_file(file_path)
+
+
+def _worker_init():
+    """进程池工作进程初始化：每个进程预热一次热对象
+
+    get_text_splitter()按进程缓存单例，这里提前触发其构建（含分隔符
+    正则编译），成本摊到池启动而不是首个文件的解析耗时上。
+    """
+    from agent.data_processor.text_splitter import get_text_splitter
+
+    get_text_splitter()
+
+
 class FileManager:
     """统一文件管理器
     
@@ -29,7 +164,9 @@ class FileManager:
         ".ppt": "ppt",
         ".xlsx": "excel",
         ".xls": "excel",
+        ".csv": "csv",
         ".txt": "txt",
+        ".md": "txt",
     }
     
     @staticmethod
@@ -59,145 +196,289 @@ class FileManager:
         return FileManager.SUPPORTED_EXTENSIONS.get(ext)
     
     @staticmethod
-    def parse_file(file_path: str) -> Dict[str, Any]:
+    def parse_file(
+        file_path: str,
+        extract_tables: bool = False,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
         """解析文件，自动根据扩展名选择解析器
-        
+
         Args:
             file_path: 文件路径
-            
+            extract_tables: 是否提取表格（PDF/DOCX/PPTX，默认跳过以加速纯文本摄取）
+            use_cache: 是否使用按内容哈希的解析缓存（大PDF重复摄取从数十秒降到毫秒级）
+
         Returns:
             解析后的文档内容，包含text、tables、metadata等
-            
+
         Raises:
             ValueError: 不支持的文件格式
             Exception: 解析失败
         """
-        if not FileManager.is_supported(file_path):
-            raise ValueError(f"不支持的文件格式: {Path(file_path).suffix}")
-        
-        file_type = FileManager.get_file_type(file_path)
-        
+        # 扩展名只计算一次（不构造Path对象），直接查分发表
+        _, ext = os.path.splitext(file_path)
+        if ext.lower() not in FileManager._DISPATCH:
+            raise ValueError(f"不支持的文件格式: {ext}")
+
+        if use_cache:
+            # 哈希整个文件远比解析便宜；返回浅拷贝，防止调用方改写缓存条目
+            return dict(_cached_parse(_file_sha256(file_path), file_path, extract_tables))
+
+        return FileManager._dispatch_parse(file_path, extract_tables)
+
+    @staticmethod
+    def _dispatch_parse(file_path: str, extract_tables: bool = False) -> Dict[str, Any]:
+        """按扩展名查表分发到具体解析器（不经过缓存）"""
+        _, ext = os.path.splitext(file_path)
+        parse = FileManager._DISPATCH.get(ext.lower())
+        if parse is None:
+            raise ValueError(f"不支持的文件格式: {ext}")
+
         try:
-            if file_type == "pdf":
-                return FileManager._parse_pdf(file_path)
-            elif file_type == "docx":
-                return FileManager._parse_docx(file_path)
-            elif file_type == "doc":
-                return FileManager._parse_doc(file_path)
-            elif file_type in ["pptx", "ppt"]:
-                return FileManager._parse_pptx(file_path)
-            elif file_type == "excel":
-                return FileManager._parse_excel(file_path)
-            elif file_type == "txt":
-                return FileManager._parse_txt(file_path)
-            else:
-                raise ValueError(f"未实现的文件类型: {file_type}")
+            return parse(file_path, extract_tables)
         except Exception as e:
             logger.error(f"解析文件失败 {file_path}: {e}", exc_info=True)
             raise
-    
+
     @staticmethod
-    def _parse_pdf(file_path: str) -> Dict[str, Any]:
-        """解析PDF文件（使用pdfplumber，更好的中文支持）
-        
+    def parse_files(
+        file_paths: List[str],
+        workers: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """批量解析文件，按文件分发到进程池
+
+        解析（pdfplumber、python-docx、pandas）是CPU密集型工作，
+        多进程可在多核机器上获得接近线性的加速。
+
         Args:
-            file_path: PDF文件路径
-            
+            file_paths: 文件路径列表
+            workers: 工作进程数，默认为CPU核数
+
         Returns:
-            解析后的内容
+            {文件路径: 解析结果或Exception} 字典，单个文件失败不影响其他文件
         """
-        try:
-            import pdfplumber
-            
-            text_content = []
-            tables = []
-            
-            with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    # 提取文本（pdfplumber对中文支持更好）
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content.append(page_text)
-                    
-                    # 提取表格（pdfplumber的表格提取能力很强）
-                    page_tables = page.extract_tables()
-                    for table_idx, table in enumerate(page_tables):
-                        if table:
-                            # 转换为DataFrame格式
-                            try:
-                                # 第一行作为表头
-                                if len(table) > 1:
-                                    df = pd.DataFrame(table[1:], columns=table[0])
-                                    tables.append({
-                                        "data": df.to_dict(orient='records'),
-                                        "columns": df.columns.tolist(),
-                                        "page": page_num + 1,
-                                        "table_index": table_idx,
-                                    })
-                                else:
-                                    # 只有一行，直接保存
-                                    tables.append({
-                                        "data": table,
-                                        "columns": table[0] if table else [],
-                                        "page": page_num + 1,
-                                        "table_index": table_idx,
-                                    })
-                            except Exception as e:
-                                logger.warning(f"转换表格失败 (页{page_num+1}, 表{table_idx}): {e}")
-                                # 保留原始表格数据
-                                tables.append({
-                                    "data": table,
-                                    "page": page_num + 1,
-                                    "table_index": table_idx,
-                                })
-            
-            return {
-                "text": "\n\n".join(text_content),
-                "tables": tables,
-                "page_count": len(text_content),
-                "file_type": "pdf",
-            }
-        except ImportError:
-            logger.warning("pdfplumber未安装，尝试使用pypdf作为备选")
-            # 备选方案：使用pypdf
-            return FileManager._parse_pdf_fallback(file_path)
-    
+        results: Dict[str, Any] = {}
+
+        if len(file_paths) <= 1:
+            # 单文件直接解析，省去进程池开销
+            for path in file_paths:
+                try:
+                    results[path] = FileManager.parse_file(path)
+                except Exception as e:
+                    results[path] = e
+            return results
+
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_worker_init,
+        ) as executor:
+            futures = {executor.submit(_parse_one, path): path for path in file_paths}
+            # as_completed让快文件先返回，不被慢文件阻塞
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    logger.error(f"批量解析文件失败 {path}: {e}")
+                    results[path] = e
+
+        return results
+
+    @staticmethod
+    def parse_files_streaming(
+        file_paths: List[str],
+        extract_tables: bool = False
+    ) -> Iterator[Tuple[str, Any]]:
+        """流式批量解析：后台线程预读下一个文件，主线程解析当前文件
+
+        读线程顺序读取文件字节（顺带算出内容哈希），把数据拉进操作系统
+        页缓存；主线程随后解析同一文件时读的是内存。磁盘读与CPU解析
+        重叠，网络文件系统或冷缓存场景下能隐藏大部分读延迟。
+        与按文件分发的parse_files进程池互补：这里保持输入顺序、逐个产出。
+
+        Args:
+            file_paths: 文件路径列表
+            extract_tables: 是否提取表格
+
+        Yields:
+            (文件路径, 解析结果或Exception) 元组，按输入顺序
+        """
+        prefetched: "queue.Queue" = queue.Queue(maxsize=_PREFETCH_DEPTH)
+        sentinel = object()
+
+        def _reader():
+            for path in file_paths:
+                try:
+                    digest = _file_sha256(path)
+                except Exception as e:
+                    prefetched.put((path, None, e))
+                    continue
+                prefetched.put((path, digest, None))
+            prefetched.put(sentinel)
+
+        reader = threading.Thread(target=_reader, name="parse-prefetch", daemon=True)
+        reader.start()
+
+        while True:
+            item = prefetched.get()
+            if item is sentinel:
+                break
+            path, digest, read_error = item
+            if read_error is not None:
+                yield path, read_error
+                continue
+            try:
+                yield path, dict(_cached_parse(digest, path, extract_tables))
+            except Exception as e:
+                logger.error(f"流式解析文件失败 {path}: {e}")
+                yield path, e
+
+        reader.join()
+
     @staticmethod
-    def _parse_pdf_fallback(file_path: str) -> Dict[str, Any]:
-        """PDF解析备选方案（使用pypdf）
+    def _parse_pdf(file_path: str, extract_tables: bool = False) -> Dict[str, Any]:
+        """解析PDF文件
+        
+        纯文本提取优先走C实现的后端（MuPDF/PDFium的文本提取比
+        pdfminer的版面分析快一个量级）；需要表格或两者都不可用时
+        回退pdfplumber（对中文和表格的支持更好）。
         
         Args:
             file_path: PDF文件路径
+            extract_tables: 是否提取表格
             
         Returns:
             解析后的内容
         """
-        import pypdf
-        
-        text_content = []
+        if not extract_tables:
+            pymupdf = _probe("pymupdf") or _probe("fitz")
+            if pymupdf is not None:
+                return FileManager._parse_pdf_pymupdf(pymupdf, file_path)
+            pypdfium2 = _probe("pypdfium2")
+            if pypdfium2 is not None:
+                return FileManager._parse_pdf_pdfium(pypdfium2, file_path)
+
+        import pdfplumber
+
+        # StringIO原地扩容，避免先攒一千个页级str再join时的双倍峰值内存
+        text_buf = io.StringIO()
+        text_pages = 0
         tables = []
-        
-        with open(file_path, 'rb') as file:
-            pdf_reader = pypdf.PdfReader(file)
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                page_text = page.extract_text()
-                if page_text:
-                    text_content.append(page_text)
+
+        # 先廉价地取页数，再决定是否并行提取
+        with pdfplumber.open(file_path) as pdf:
+            page_count = len(pdf.pages)
+
+        # 已在parse_files的工作进程里时不再开子进程池：批量导入大PDF
+        # 会按cpu²扩散进程数，且每个文件都重付一次池启动成本
+        in_worker = multiprocessing.parent_process() is not None
+
+        if page_count <= _PDF_PAGE_BATCH or in_worker:
+            # 页数少（或本身就是工作进程）时串行处理，省去进程池启动开销
+            page_results = _extract_pdf_pages(file_path, list(range(page_count)), extract_tables)
+        else:
+            # 按页批分发到进程池：pdfminer的版面分析是CPU密集型，多进程绕开GIL
+            batches = [
+                list(range(i, min(i + _PDF_PAGE_BATCH, page_count)))
+                for i in range(0, page_count, _PDF_PAGE_BATCH)
+            ]
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                page_results = sorted(chain.from_iterable(
+                    executor.map(_extract_pdf_pages, repeat(file_path), batches, repeat(extract_tables))
+                ))
+
+        for page_num, page_text, page_tables in page_results:
+            # 提取文本（pdfplumber对中文支持更好）
+            if page_text:
+                if text_pages:
+                    text_buf.write("\n\n")
+                text_buf.write(page_text)
+                text_pages += 1
+
+            # 提取表格（pdfplumber的表格提取能力很强）
+            for table_idx, table in enumerate(page_tables):
+                if table:
+                    # 转换为DataFrame格式
+                    try:
+                        # 第一行作为表头
+                        if len(table) > 1:
+                            df = pd.DataFrame(table[1:], columns=table[0])
+                            tables.append({
+                                "data": df.to_dict(orient='records'),
+                                "columns": df.columns.tolist(),
+                                "page": page_num + 1,
+                                "table_index": table_idx,
+                            })
+                        else:
+                            # 只有一行，直接保存
+                            tables.append({
+                                "data": table,
+                                "columns": table[0] if table else [],
+                                "page": page_num + 1,
+                                "table_index": table_idx,
+                            })
+                    except Exception as e:
+                        logger.warning(f"转换表格失败 (页{page_num+1}, 表{table_idx}): {e}")
+                        # 保留原始表格数据
+                        tables.append({
+                            "data": table,
+                            "page": page_num + 1,
+                            "table_index": table_idx,
+                        })
         
         return {
-            "text": "\n\n".join(text_content),
+            "text": text_buf.getvalue(),
             "tables": tables,
-            "page_count": len(text_content),
+            "page_count": text_pages,
             "file_type": "pdf",
         }
-    
+
     @staticmethod
-    def _parse_docx(file_path: str) -> Dict[str, Any]:
+    def _parse_pdf_pymupdf(pymupdf, file_path: str) -> Dict[str, Any]:
+        """纯文本PDF提取（PyMuPDF后端，最快）"""
+        text_parts = []
+        with pymupdf.open(file_path) as doc:
+            for page in doc:
+                text = page.get_text("text")
+                if text:
+                    text_parts.append(text)
+
+        return {
+            "text": "\n\n".join(text_parts),
+            "tables": [],
+            "page_count": len(text_parts),
+            "file_type": "pdf",
+        }
+
+    @staticmethod
+    def _parse_pdf_pdfium(pypdfium2, file_path: str) -> Dict[str, Any]:
+        """纯文本PDF提取（pypdfium2后端，PDFium的C++实现）"""
+        text_parts = []
+        pdf = pypdfium2.PdfDocument(file_path)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                if text:
+                    text_parts.append(text)
+        finally:
+            pdf.close()
+
+        return {
+            "text": "\n\n".join(text_parts),
+            "tables": [],
+            "page_count": len(text_parts),
+            "file_type": "pdf",
+        }
+
+    @staticmethod
+    def _parse_docx(file_path: str, extract_tables: bool = False) -> Dict[str, Any]:
         """解析DOCX文件
         
         Args:
             file_path: DOCX文件路径
+            extract_tables: 是否提取表格
             
         Returns:
             解析后的内容
@@ -205,21 +486,32 @@ class FileManager:
         from docx import Document
         
         doc = Document(file_path)
-        text_content = []
+        text_buf = io.StringIO()
         tables = []
         
         # 提取文本
         for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text_content.append(paragraph.text)
+            # paragraph.text每次访问都会遍历XML合并run，只取一次
+            text = paragraph.text
+            if text.strip():
+                if text_buf.tell():
+                    text_buf.write("\n\n")
+                text_buf.write(text)
         
-        # 提取表格
-        for table_idx, table in enumerate(doc.tables):
-            table_data = []
-            for row in table.rows:
-                row_data = [cell.text.strip() for cell in row.cells]
-                table_data.append(row_data)
-            
+        # 提取表格（可选）：优先用lxml直接XPath原始XML，
+        # 绕开python-docx逐格构造_Cell对象的Python层开销（大表快一个量级）
+        raw_tables = []
+        if extract_tables:
+            try:
+                raw_tables = FileManager._extract_docx_tables_lxml(file_path)
+            except Exception as e:
+                logger.warning(f"lxml表格提取失败，回退python-docx: {e}")
+                raw_tables = [
+                    [[cell.text.strip() for cell in row.cells] for row in table.rows]
+                    for table in doc.tables
+                ]
+
+        for table_idx, table_data in enumerate(raw_tables):
             if table_data:
                 try:
                     # 第一行作为表头
@@ -241,11 +533,44 @@ class FileManager:
                     tables.append({"data": table_data, "table_index": table_idx})
         
         return {
-            "text": "\n\n".join(text_content),
+            "text": text_buf.getvalue(),
             "tables": tables,
             "file_type": "docx",
         }
-    
+
+    @staticmethod
+    def _extract_docx_tables_lxml(file_path: str) -> List[List[List[str]]]:
+        """用lxml XPath从document.xml直接提取顶层表格的单元格文本
+
+        python-docx每访问一个单元格都会新建_Cell并重扫run XML；
+        lxml的string(.)在C层一次取整格文本，200行x10列的表格差距明显。
+
+        Args:
+            file_path: DOCX文件路径
+
+        Returns:
+            表格列表，每个表格为行x列的字符串二维列表
+        """
+        import zipfile
+
+        from lxml import etree
+
+        with zipfile.ZipFile(file_path) as zf:
+            with zf.open("word/document.xml") as doc_xml:
+                tree = etree.parse(doc_xml)
+
+        tables = []
+        # 只取body直属的顶层表格，与doc.tables的语义一致（不含嵌套表）
+        for tbl in tree.xpath("/w:document/w:body/w:tbl", namespaces=_WNS):
+            rows = []
+            for tr in tbl.xpath("./w:tr", namespaces=_WNS):
+                rows.append([
+                    tc.xpath("string(.)").strip()
+                    for tc in tr.xpath("./w:tc", namespaces=_WNS)
+                ])
+            tables.append(rows)
+        return tables
+
     @staticmethod
     def _parse_doc(file_path: str) -> Dict[str, Any]:
         """解析DOC文件（老格式Word文档）
@@ -307,11 +632,12 @@ class FileManager:
             raise ImportError("解析DOC文件需要安装docx2python: pip install docx2python")
     
     @staticmethod
-    def _parse_pptx(file_path: str) -> Dict[str, Any]:
+    def _parse_pptx(file_path: str, extract_tables: bool = False) -> Dict[str, Any]:
         """解析PPTX文件
         
         Args:
             file_path: PPTX文件路径
+            extract_tables: 是否提取表格
             
         Returns:
             解析后的内容
@@ -319,7 +645,7 @@ class FileManager:
         from pptx import Presentation
         
         prs = Presentation(file_path)
-        text_content = []
+        text_buf = io.StringIO()
         tables = []
         
         # 提取文本和表格
@@ -329,8 +655,8 @@ class FileManager:
                 if hasattr(shape, "text") and shape.text.strip():
                     slide_text.append(shape.text)
                 
-                # 提取表格
-                if shape.shape_type == 19:  # MSO_SHAPE_TYPE.TABLE
+                # 提取表格（可选）
+                if extract_tables and shape.shape_type == 19:  # MSO_SHAPE_TYPE.TABLE
                     table = shape.table
                     table_data = []
                     for row in table.rows:
@@ -357,10 +683,13 @@ class FileManager:
                             tables.append({"data": table_data, "slide": slide_num + 1})
             
             if slide_text:
-                text_content.append(f"\n幻灯片 {slide_num + 1}:\n" + "\n".join(slide_text))
+                if text_buf.tell():
+                    text_buf.write("\n\n")
+                text_buf.write(f"\n幻灯片 {slide_num + 1}:\n")
+                text_buf.write("\n".join(slide_text))
         
         return {
-            "text": "\n\n".join(text_content),
+            "text": text_buf.getvalue(),
             "tables": tables,
             "slide_count": len(prs.slides),
             "file_type": "pptx",
@@ -376,41 +705,107 @@ class FileManager:
         Returns:
             解析后的内容
         """
-        text_content = []
+        text_buf = io.StringIO()
         tables = []
         
         try:
-            # 读取所有工作表
-            excel_file = pd.ExcelFile(file_path)
-            
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                
-                # 将每个工作表作为一个表格
-                if not df.empty:
-                    # 清理NaN值
-                    df = df.fillna("")
-                    
-                    tables.append({
-                        "data": df.to_dict(orient='records'),
-                        "columns": df.columns.tolist(),
-                        "sheet_name": sheet_name,
-                    })
-                    
-                    # 同时生成文本描述
-                    text_content.append(f"\n工作表: {sheet_name}\n")
-                    text_content.append(df.to_string(index=False))
-            
+            if file_path.lower().endswith(".xlsx"):
+                # 流式逐行读取，不物化DataFrame，避免to_string格式化全部单元格
+                from openpyxl import load_workbook
+
+                workbook = load_workbook(file_path, read_only=True, data_only=True)
+                try:
+                    sheet_count = len(workbook.sheetnames)
+                    for worksheet in workbook.worksheets:
+                        rows = worksheet.iter_rows(values_only=True)
+                        header = next(rows, None)
+                        if header is None:
+                            continue
+
+                        columns = ["" if cell is None else str(cell) for cell in header]
+                        records = []
+                        lines = ["\t".join(columns)]
+                        for row in rows:
+                            records.append(dict(zip(columns, ("" if cell is None else cell for cell in row))))
+                            lines.append("\t".join("" if cell is None else str(cell) for cell in row))
+
+                        if records:
+                            tables.append({
+                                "data": records,
+                                "columns": columns,
+                                "sheet_name": worksheet.title,
+                            })
+
+                            # 同时生成文本描述
+                            if text_buf.tell():
+                                text_buf.write("\n\n")
+                            text_buf.write(f"\n工作表: {worksheet.title}\n")
+                            text_buf.write("\n\n")
+                            text_buf.write("\n".join(lines))
+                finally:
+                    workbook.close()
+            else:
+                # .xls 等老格式仍走pandas
+                excel_file = pd.ExcelFile(file_path)
+                sheet_count = len(excel_file.sheet_names)
+
+                for sheet_name in excel_file.sheet_names:
+                    df = pd.read_excel(excel_file, sheet_name=sheet_name)
+
+                    # 将每个工作表作为一个表格
+                    if not df.empty:
+                        # 清理NaN值
+                        df = df.fillna("")
+
+                        tables.append({
+                            "data": df.to_dict(orient='records'),
+                            "columns": df.columns.tolist(),
+                            "sheet_name": sheet_name,
+                        })
+
+                        # 同时生成文本描述
+                        if text_buf.tell():
+                            text_buf.write("\n\n")
+                        text_buf.write(f"\n工作表: {sheet_name}\n")
+                        text_buf.write("\n\n")
+                        text_buf.write(df.to_string(index=False))
+
             return {
-                "text": "\n\n".join(text_content),
+                "text": text_buf.getvalue(),
                 "tables": tables,
-                "sheet_count": len(excel_file.sheet_names),
+                "sheet_count": sheet_count,
                 "file_type": "excel",
             }
         except Exception as e:
             logger.error(f"解析Excel文件失败 {file_path}: {e}")
             raise
     
+    @staticmethod
+    def _parse_csv(file_path: str) -> Dict[str, Any]:
+        """解析CSV文件
+        
+        Args:
+            file_path: CSV文件路径
+            
+        Returns:
+            解析后的内容
+        """
+        df = pd.read_csv(file_path)
+        df = df.fillna("")
+
+        tables = []
+        if not df.empty:
+            tables.append({
+                "data": df.to_dict(orient='records'),
+                "columns": df.columns.tolist(),
+            })
+
+        return {
+            "text": df.to_string(index=False),
+            "tables": tables,
+            "file_type": "csv",
+        }
+
     @staticmethod
     def _parse_txt(file_path: str) -> Dict[str, Any]:
         """解析TXT文件（自动检测编码）
@@ -421,41 +816,64 @@ class FileManager:
         Returns:
             解析后的内容
         """
-        # 先检测编码
+        # 打开一次：大文件用mmap避免把整个文件拷入用户态缓冲，小文件直接读
         with open(file_path, 'rb') as f:
-            raw_data = f.read()
-            result = chardet.detect(raw_data)
+            size = os.fstat(f.fileno()).st_size
+            if size >= _MMAP_MIN_SIZE:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buf = f.read()
+
+        try:
+            # 检测编码：只采样文件头32KB，大文件无需整读即可得到足够置信度
+            result = chardet.detect(bytes(buf[:32768]))
             encoding = result.get('encoding', 'utf-8')
             confidence = result.get('confidence', 0)
-            
+
             logger.info(f"检测到编码: {encoding} (置信度: {confidence:.2f})")
-        
-        # 尝试多种编码
-        encodings_to_try = [encoding, 'utf-8', 'gbk', 'gb2312', 'big5', 'latin-1']
-        
-        for enc in encodings_to_try:
-            try:
-                with open(file_path, 'r', encoding=enc) as f:
-                    text = f.read()
+
+            # 尝试多种编码（codecs直接解码缓冲区，不产生中间bytes切片）
+            encodings_to_try = [encoding, 'utf-8', 'gbk', 'gb2312', 'big5', 'latin-1']
+
+            for enc in encodings_to_try:
+                try:
+                    text = codecs.getdecoder(enc)(buf)[0]
                     return {
                         "text": text,
                         "tables": [],
                         "file_type": "txt",
                         "encoding": enc,
                     }
-            except (UnicodeDecodeError, LookupError):
-                continue
-        
-        # 如果所有编码都失败，使用错误处理模式
-        logger.warning(f"无法确定文件编码，使用错误处理模式: {file_path}")
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-            text = f.read()
+                except (UnicodeDecodeError, LookupError, TypeError):
+                    continue
+
+            # 如果所有编码都失败，使用错误处理模式
+            logger.warning(f"无法确定文件编码，使用错误处理模式: {file_path}")
+            text = codecs.getdecoder('utf-8')(buf, 'replace')[0]
             return {
                 "text": text,
                 "tables": [],
                 "file_type": "txt",
                 "encoding": "utf-8 (with errors replaced)",
             }
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+
+
+# 扩展名到解析器的分发表（模块加载时构建一次，统一为(path, extract_tables)签名）
+FileManager._DISPATCH = {
+    ".pdf": FileManager._parse_pdf,
+    ".docx": FileManager._parse_docx,
+    ".doc": lambda path, extract_tables: FileManager._parse_doc(path),
+    ".pptx": FileManager._parse_pptx,
+    ".ppt": FileManager._parse_pptx,
+    ".xlsx": lambda path, extract_tables: FileManager._parse_excel(path),
+    ".xls": lambda path, extract_tables: FileManager._parse_excel(path),
+    ".csv": lambda path, extract_tables: FileManager._parse_csv(path),
+    ".txt": lambda path, extract_tables: FileManager._parse_txt(path),
+    ".md": lambda path, extract_tables: FileManager._parse_txt(path),
+}
 
 
 
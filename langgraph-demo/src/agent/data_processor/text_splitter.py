@@ -1,37 +1,32 @@
 """文本分割器 - 基于 deep-searcher 实现"""
+import functools
 import logging
+import re
+import sys
+from bisect import bisect_right
 from typing import List, Dict, Any
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from agent.config import config
 
 logger = logging.getLogger(__name__)
 
+# 不超过该长度的块做字符串驻留（重复短串合并为同一对象，节省内存）
+_INTERN_MAX_LEN = 128
+
 
 class TextSplitter:
-    """文本分割器"""
-    
+    """文本分割器
+
+    使用单次正则扫描收集所有分隔符边界，再按chunk_size贪心切分，
+    替代LangChain递归分割器的逐层重复扫描（对大文本O(N)对多趟）。
+    """
+
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.data_processing.chunk_size,
-            chunk_overlap=config.data_processing.chunk_overlap,
-            length_function=len,
-            separators=[
-                "\n\n",  # 段落
-                "\n",    # 换行
-                "。",    # 中文句号
-                "！",    # 中文感叹号
-                "？",    # 中文问号
-                ". ",    # 英文句号
-                "! ",    # 英文感叹号
-                "? ",    # 英文问号
-                "; ",    # 分号
-                ", ",    # 逗号
-                " ",     # 空格
-                "",      # 字符级
-            ],
-        )
-    
+        self.chunk_size = config.data_processing.chunk_size
+        self.chunk_overlap = config.data_processing.chunk_overlap
+        # 所有分隔符合并为一个备选组，优先匹配段落/换行/句末标点
+        self._sep_re = re.compile(r'\n\n|\n|。|！|？|\. |! |\? |; |, | ')
+
     def split_text(self, text: str) -> List[str]:
         """分割文本
         
@@ -43,18 +38,41 @@ class TextSplitter:
         """
         if not text or not text.strip():
             return []
-        
-        chunks = self.text_splitter.split_text(text)
-        
-        # 过滤太短的块
+
+        length = len(text)
         min_chunk_size = config.data_processing.min_chunk_size
-        filtered_chunks = [
-            chunk.strip() 
-            for chunk in chunks 
-            if len(chunk.strip()) >= min_chunk_size
-        ]
-        
-        return filtered_chunks
+
+        if length <= self.chunk_size:
+            stripped = text.strip()
+            return [stripped] if len(stripped) >= min_chunk_size else []
+
+        # 一趟扫描收集全部分隔符边界（分隔符结束位置为候选切分点）
+        boundaries = [m.end() for m in self._sep_re.finditer(text)]
+        if not boundaries or boundaries[-1] != length:
+            boundaries.append(length)
+
+        chunks = []
+        start = 0
+        while start < length:
+            limit = start + self.chunk_size
+            if limit >= length:
+                end = length
+            else:
+                # 取不超过limit的最后一个边界；没有则硬切
+                idx = bisect_right(boundaries, limit) - 1
+                end = boundaries[idx] if idx >= 0 and boundaries[idx] > start else limit
+
+            chunk = text[start:end].strip()
+            # 过滤太短的块
+            if len(chunk) >= min_chunk_size:
+                chunks.append(chunk)
+
+            if end >= length:
+                break
+            # 回退chunk_overlap个字符形成重叠
+            start = max(end - self.chunk_overlap, start + 1)
+
+        return chunks
     
     def split_documents(
         self,
@@ -80,30 +98,29 @@ class TextSplitter:
             return []
         
         chunks = self.split_text(text)
-        
+
+        # 公共字段只构造一次，每块浅拷贝后补chunk_index，减少逐块重复建键
+        base_meta = {
+            "doc_id": doc_id,
+            "user_id": user_id,
+            "doc_type": doc_type,
+            "total_chunks": len(chunks),
+        }
+
         result = []
         for idx, chunk_text in enumerate(chunks):
-            result.append({
-                "content": chunk_text,
-                "metadata": {
-                    "doc_id": doc_id,
-                    "user_id": user_id,
-                    "doc_type": doc_type,
-                    "chunk_index": idx,
-                    "total_chunks": len(chunks),
-                }
-            })
-        
+            if len(chunk_text) <= _INTERN_MAX_LEN:
+                # 短块（表格行、每页重复的页眉等）驻留，重复串共享同一对象
+                chunk_text = sys.intern(chunk_text)
+            metadata = dict(base_meta)
+            metadata["chunk_index"] = idx
+            result.append({"content": chunk_text, "metadata": metadata})
+
         logger.info(f"Split document {doc_id} into {len(result)} chunks")
         return result
 
 
-# 全局实例
-_text_splitter = None
-
+@functools.cache
 def get_text_splitter() -> TextSplitter:
-    """获取文本分割器单例"""
-    global _text_splitter
-    if _text_splitter is None:
-        _text_splitter = TextSplitter()
-    return _text_splitter
+    """获取文本分割器单例（functools.cache保证多线程下只构建一次）"""
+    return TextSplitter()
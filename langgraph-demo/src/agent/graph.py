@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+from typing import Any, Dict, List, Optional
 from langchain_core.messages import HumanMessage
 from langgraph.graph import StateGraph
 from langgraph.prebuilt import ToolNode
 
+from agent.config import config
 from agent.rag.graph import get_rag_graph
 from agent.rag.state import GraphRAGState
 
@@ -20,19 +22,9 @@ def create_main_graph():
 graph = create_main_graph()
 
 
-def invoke_rag(query: str, user_id: str = None) -> Dict[str, Any]:
-    """便捷函数：调用RAG系统
-    
-    Args:
-        query: 用户查询
-        user_id: 用户ID（可选）
-        
-    Returns:
-        RAG结果
-    """
-    rag_graph = get_rag_graph()
-    
-    initial_state = GraphRAGState(
+def _build_initial_state(query: str, user_id: Optional[str] = None) -> GraphRAGState:
+    """构造一次图调用的初始状态"""
+    return GraphRAGState(
         messages=[HumanMessage(content=query)],
         query=query,
         user_id=user_id,
@@ -45,6 +37,49 @@ def invoke_rag(query: str, user_id: str = None) -> Dict[str, Any]:
         final_answer=None,
         metadata={},
     )
+
+
+def invoke_rag(query: str, user_id: str = None) -> Dict[str, Any]:
+    """便捷函数：调用RAG系统
+    
+    Args:
+        query: 用户查询
+        user_id: 用户ID（可选）
+        
+    Returns:
+        RAG结果
+    """
+    rag_graph = get_rag_graph()
     
-    result = rag_graph.invoke(initial_state)
+    # 节点是协程（LLM/嵌入调用为异步），同步入口用asyncio.run驱动
+    result = asyncio.run(rag_graph.ainvoke(_build_initial_state(query, user_id)))
     return result
+
+
+def invoke_batch(queries: List[str], user_id: str = None) -> List[Dict[str, Any]]:
+    """批量调用RAG系统：多条查询共享一个事件循环并发执行
+
+    逐条invoke_rag会串行付出每条查询的全部LLM/检索往返；图节点都是
+    I/O为主的协程，放进同一个事件循环用asyncio.gather并发后，批量
+    吞吐随并发度扩展。信号量限制同时在跑的图实例数，防止对LLM/向量
+    库打出过量并发。
+
+    Args:
+        queries: 用户查询列表
+        user_id: 用户ID（可选，批内共享）
+
+    Returns:
+        RAG结果列表，与输入顺序一致
+    """
+    rag_graph = get_rag_graph()
+
+    async def _run_all():
+        semaphore = asyncio.Semaphore(config.rag.max_concurrency)
+
+        async def _one(query: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await rag_graph.ainvoke(_build_initial_state(query, user_id))
+
+        return await asyncio.gather(*(_one(query) for query in queries))
+
+    return asyncio.run(_run_all())
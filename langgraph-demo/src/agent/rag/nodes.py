@@ -1,58 +1,309 @@
 """图RAG节点实现"""
 
+import asyncio
+import functools
+import heapq
 import logging
 import os
-from typing import Dict, Any, List
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+import numpy as np
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from pydantic import BaseModel, Field
 
-from agent.rag.state import GraphRAGState
-from agent.vector_store.factory import VectorStoreFactory
+from agent.rag.state import GraphRAGState, RetrievedBatch
+from agent.vector_store.factory import get_vector_store as _get_shared_vector_store
 from agent.config import config
 
 logger = logging.getLogger(__name__)
 
+# 子查询行首的编号/标点（如 "1. "、"1) "），模块加载时编译一次
+_LEADING_NUM_RE = re.compile(r'^[\d.)\s]+')
+
+
+# 答案语义缓存：命中时跳过整个LLM生成（prefill+decode是延迟大头）
+_ANSWER_CACHE_MAX = 128
+_ANSWER_SIM_THRESHOLD = 0.95       # 查询嵌入余弦相似度下限
+_ANSWER_JACCARD_THRESHOLD = 0.7    # 检索块指纹集合的Jaccard重合度下限
+
+# 规范化查询 -> (归一化查询嵌入或None, 检索块指纹集合, 答案)，FIFO淘汰
+_answer_cache: "OrderedDict[str, Tuple[Optional[np.ndarray], frozenset, str]]" = OrderedDict()
+
+
+# 提示词模板：模块加载时定义一次，节点内只做format填充
+_REFLECTION_PROMPT = """你是一个金融文档检索质量评估专家。请评估以下检索结果是否充分回答了用户的问题。
+
+用户问题: {query}
+
+检索到的文档:
+{retrieved_texts}
+
+请从以下角度评估：
+1. 检索结果的相关性（是否与问题相关）
+2. 信息的完整性（是否包含回答问题的关键信息）
+3. 是否需要更精确的检索策略
+
+请用简洁的中文回答：
+- 如果检索结果充分，回答"检索充分，可以直接生成答案"
+- 如果需要改进，指出问题并建议改进方向
+
+评估结果："""
+
+_REFINE_PROMPT = """基于以下反思结果，请优化用户的查询问题，使其更适合文档检索。
+
+原始问题: {query}
+
+反思结果: {reflection_result}
+
+请生成一个更精确的查询问题，要求：
+1. 保持问题的核心意图
+2. 增加更具体的关键词
+3. 如果原始问题模糊，使其更加明确
+
+优化后的问题："""
+
+# 重排序+充分性评估的融合提示词：一次LLM往返同时产出排序和反思结论
+_RERANK_REFLECT_PROMPT = """你是一个专业的金融文档相关性评估专家。请根据用户问题完成两件事：
+1. 对以下检索到的文档块按相关性从高到低重排序
+2. 评估这些文档是否足以回答用户问题
+
+用户问题: {query}
+
+检索到的文档块:
+{chunks_text}
+
+请返回：
+- ranking: 最相关的文档索引列表（从1开始），按相关性从高到低
+- sufficient: 文档内容是否足以回答问题
+- reason: 充分性判断的简要理由（中文一两句话）"""
+
+# 生成答案的系统提示词（金融领域特化，要求生成投资意见）
+# 注意保持字节级稳定：它是LLM服务端前缀KV缓存的最前段
+_SYSTEM_PROMPT = """你是一个专业的金融投资顾问AI助手，擅长分析企业财报、投融资报告等金融文档。
+
+你的职责：
+1. 基于提供的文档内容和网络搜索结果，准确回答用户问题
+2. 回答要专业、准确，引用具体数据
+3. 综合分析所有信息（包括从多个子查询检索到的信息），给出专业的投资建议
+4. 使用中文回答，保持专业术语的准确性
+
+重要原则：
+- 优先使用知识库文档内容，网络搜索结果作为补充
+- 如果信息不足，明确指出缺失的部分
+- 涉及财务数据时，要准确引用数字和单位
+- 综合分析所有子查询的结果，形成完整的答案
+- 最后必须提供一条明确的投资意见或建议"""
+
+# 可变内容（查询分解信息、用户问题）在模板末尾，文档前缀保持稳定
+_USER_PROMPT = """基于以下信息，回答用户问题并提供投资建议。
+
+=== 知识库文档内容 ===
+{context_texts}
+{web_context}{sub_query_info}
+
+用户问题: {query}
+
+请按以下格式回答：
+1. 首先综合分析所有检索到的信息，回答用户的具体问题
+2. 引用相关的数据和分析（如果涉及多个实体，分别说明）
+3. 最后提供一条明确的投资意见或建议
+
+回答："""
+
+# 嵌入缓存：分解出的子查询在会话间高度重复（"京东的背景"之类），
+# 命中的文本不再进批量嵌入请求，全命中时省掉整次HTTP往返
+_EMBED_CACHE_MAX = 4096
+
+# 文本 -> 嵌入向量，FIFO淘汰
+_embed_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+# 反思结论缓存：同一(查询, 前3块指纹)组合的评估不重复调用LLM
+_REFLECTION_CACHE_MAX = 1024
+
+# (规范化查询, 块指纹集合) -> (反思文本, 内容层面是否不充分)，FIFO淘汰
+_reflection_cache: "OrderedDict[Tuple[str, frozenset], Tuple[str, bool]]" = OrderedDict()
+
+
+def _normalize_query(query: str) -> str:
+    """查询规范化（去空白），作为缓存的精确匹配键"""
+    return "".join(query.split())
+
+
+def _chunk_fingerprints(chunks: List[Dict[str, Any]]) -> frozenset:
+    """检索块指纹集合（与aggregate_results去重一致，对完整内容取hash）"""
+    return frozenset(hash(chunk['content']) for chunk in chunks)
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    """两个指纹集合的Jaccard相似度"""
+    if not a and not b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _answer_cache_lookup_semantic(
+    query_embedding: List[float],
+    chunk_ids: frozenset
+) -> Optional[str]:
+    """按查询嵌入余弦+检索块重合度查找缓存答案"""
+    q = np.asarray(query_embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(q))
+    if norm == 0.0:
+        return None
+    q /= norm
+    for emb, ids, answer in _answer_cache.values():
+        if emb is None:
+            continue
+        if float(emb @ q) >= _ANSWER_SIM_THRESHOLD and _jaccard(ids, chunk_ids) >= _ANSWER_JACCARD_THRESHOLD:
+            return answer
+    return None
+
+
+def _answer_cache_store(
+    query_key: str,
+    query_embedding: Optional[List[float]],
+    chunk_ids: frozenset,
+    answer: str
+) -> None:
+    """写入答案缓存并按上限淘汰最旧条目"""
+    emb = None
+    if query_embedding is not None:
+        emb = np.asarray(query_embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(emb))
+        emb = emb / norm if norm else None
+    _answer_cache[query_key] = (emb, chunk_ids, answer)
+    while len(_answer_cache) > _ANSWER_CACHE_MAX:
+        _answer_cache.popitem(last=False)
+
 
-# 全局LLM和Embedding实例
-_llm = None
-_embedding = None
-_vector_store = None
+# 客户端单例：双重检查锁。functools.cache只保证缓存一个结果，
+# 冷启动并发突发时多个线程仍可能各构建一个重客户端再竞争写入；
+# 锁内复查让K个并发首调用只付一次构建成本（TLS/httpx初始化约50-100ms）
+# 按事件循环缓存客户端：httpx.AsyncClient的keep-alive连接绑定创建它
+# 的循环，而invoke_rag和Streamlit每轮对话都用asyncio.run新开循环——
+# 跨循环复用会让第二次调用在已关闭的循环上发请求（"Event loop is
+# closed"）。循环被回收时WeakKeyDictionary自动丢弃对应缓存槽。
+_loop_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_no_loop_clients: dict = {}
+# 两把锁分层：_http_client_lock只管缓存槽和http客户端的创建，
+# _client_lock只管LLM/Embedding实例构建。互不嵌套，哪一层的辅助
+# 函数在另一层临界区内被调用都不会自锁死
+_http_client_lock = threading.Lock()
+_client_lock = threading.Lock()
+
+
+def _client_cache() -> dict:
+    """当前事件循环对应的客户端缓存槽（无运行循环时用进程级槽）"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _no_loop_clients
+    cache = _loop_clients.get(loop)
+    if cache is None:
+        with _http_client_lock:
+            cache = _loop_clients.get(loop)
+            if cache is None:
+                cache = {}
+                _loop_clients[loop] = cache
+    return cache
+
+
+def _get_http_async_client() -> httpx.AsyncClient:
+    """LLM与嵌入客户端共享的httpx异步客户端（每个事件循环一个）
+
+    默认每个OpenAI客户端各建一个连接池；共享后同一循环内对话与嵌入
+    请求复用同一批keep-alive连接，省掉反复的TCP/TLS握手。
+    """
+    cache = _client_cache()
+    client = cache.get("http")
+    if client is None:
+        with _http_client_lock:
+            client = cache.get("http")
+            if client is None:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+                )
+                cache["http"] = client
+    return client
 
 
 def get_llm():
-    """获取LLM实例（单例）"""
-    global _llm
-    if _llm is None:
-        _llm = ChatOpenAI(
-            model=config.llm.model_name,
-            temperature=config.llm.temperature,
-            max_tokens=config.llm.max_tokens,
-            timeout=config.llm.timeout,
-            base_url=config.llm.base_url,
-            api_key=config.llm.api_key,
-        )
-    return _llm
+    """获取LLM实例（按事件循环缓存，双重检查锁保证并发首调用只构建一次）"""
+    cache = _client_cache()
+    llm = cache.get("llm")
+    if llm is None:
+        # 锁外先取共享http客户端：其内部也要拿_client_lock，
+        # 临界区内调用会对非重入锁自锁死
+        http_client = _get_http_async_client()
+        with _client_lock:
+            llm = cache.get("llm")
+            if llm is None:
+                llm = ChatOpenAI(
+                    model=config.llm.model_name,
+                    temperature=config.llm.temperature,
+                    max_tokens=config.llm.max_tokens,
+                    timeout=config.llm.timeout,
+                    base_url=config.llm.base_url,
+                    api_key=config.llm.api_key,
+                    http_async_client=http_client,
+                )
+                cache["llm"] = llm
+    return llm
 
 
 def get_embedding():
-    """获取Embedding实例（单例）"""
-    global _embedding
-    if _embedding is None:
-        _embedding = OpenAIEmbeddings(
-            model=config.embedding.model_name,
-            openai_api_key=config.llm.api_key,
-            openai_api_base=config.llm.base_url,
-        )
-    return _embedding
+    """获取Embedding实例（按事件循环缓存，双重检查锁保证并发首调用只构建一次）"""
+    cache = _client_cache()
+    embedding = cache.get("embedding")
+    if embedding is None:
+        # 同get_llm：http客户端必须在进入临界区之前获取
+        http_client = _get_http_async_client()
+        with _client_lock:
+            embedding = cache.get("embedding")
+            if embedding is None:
+                embedding = OpenAIEmbeddings(
+                    model=config.embedding.model_name,
+                    openai_api_key=config.llm.api_key,
+                    openai_api_base=config.llm.base_url,
+                    http_async_client=http_client,
+                )
+                cache["embedding"] = embedding
+    return embedding
 
 
 def get_vector_store():
-    """获取向量存储实例（单例）"""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = VectorStoreFactory.create_vector_store()
-        _vector_store.initialize()
-    return _vector_store
+    """获取向量存储实例（复用工厂的进程级共享单例）"""
+    return _get_shared_vector_store()
+
+
+@functools.cache
+def get_tavily_client():
+    """获取Tavily客户端单例（None表示未安装或未配置API密钥）
+
+    每次搜索重新import、读环境变量、建客户端会重复付出初始化开销；
+    探测结果连同客户端一起缓存，失败也只告警一次。
+    """
+    try:
+        from tavily import TavilyClient
+    except ImportError as e:
+        logger.error(f"【web_search】Tavily未安装: {e}，请运行：pip install tavily-python")
+        logger.error(f"【web_search】如果已安装，请运行：pip install -e . 重新安装项目依赖")
+        return None
+
+    tavily_api_key = os.getenv("TAVILY_API_KEY")
+    if not tavily_api_key:
+        logger.warning("TAVILY_API_KEY未设置，跳过网络搜索")
+        return None
+
+    return TavilyClient(api_key=tavily_api_key)
 
 
 def decompose_query(state: GraphRAGState) -> Dict[str, Any]:
@@ -102,17 +353,14 @@ def decompose_query(state: GraphRAGState) -> Dict[str, Any]:
         
         response = llm.invoke([HumanMessage(content=decompose_prompt)]).content.strip()
         
-        # 解析子查询
-        sub_queries = []
-        for line in response.split('\n'):
-            line = line.strip()
-            # 移除编号（如 "1. ", "1) " 等）
-            if line:
-                # 移除开头的数字和标点
-                import re
-                line = re.sub(r'^[\d\.\)\s]+', '', line)
-                if line:
-                    sub_queries.append(line)
+        # 解析子查询：单次C层扫描分行，预编译正则去掉行首编号
+        sub_queries = [
+            cleaned
+            for cleaned in (
+                _LEADING_NUM_RE.sub('', line.strip()) for line in response.splitlines()
+            )
+            if cleaned
+        ]
         
         # 如果没有分解出子查询，使用原查询
         if not sub_queries:
@@ -137,113 +385,147 @@ def decompose_query(state: GraphRAGState) -> Dict[str, Any]:
         }
 
 
-def retrieve(state: GraphRAGState) -> Dict[str, Any]:
+def _filter_search_results(search_results, current_query: str):
+    """按相似度阈值过滤检索结果，必要时降级为动态阈值
+
+    结果先转成列式RetrievedBatch（分数为float32数组），过滤在列上
+    完成后只为保留行构造dict，避免为被丢弃的结果分配对象。
+
+    Args:
+        search_results: 向量检索返回的结果列表
+        current_query: 当前查询（标记chunk来源）
+
+    Returns:
+        (retrieved_chunks, retrieval_scores) 元组
+    """
+    batch = RetrievedBatch.from_results(search_results)
+
+    logger.info(f"向量检索返回 {len(batch)} 个结果")
+    for i in range(min(len(batch), 5)):  # 只记录前5个
+        logger.info(f"结果 {i+1}: 相似度={batch.scores[i]:.4f}, 阈值={config.rag.similarity_threshold}")
+
+    # 先看最高分再定阈值，过滤只做一遍：静态阈值会滤空时直接换成
+    # 动态阈值（最高分的75%，至少0.3，更宽松以提高召回率）
+    threshold = config.rag.similarity_threshold
+    if len(batch) > 0:
+        max_score = float(batch.scores.max())
+        if max_score < threshold:
+            threshold = max(max_score * 0.75, 0.3)
+            logger.warning(
+                f"阈值 {config.rag.similarity_threshold} 会过滤掉所有结果，"
+                f"最高分: {max_score:.4f}，使用动态阈值: {threshold:.4f}"
+            )
+
+    # 阈值比较在float32数组上一次完成，不逐条做Python层属性访问
+    kept = batch.select(np.flatnonzero(batch.scores >= threshold))
+
+    logger.info(f"经过阈值过滤后，检索到 {len(kept)} 个相关文档块")
+
+    return kept.to_chunks(current_query), kept.scores.tolist()
+
+
+async def embed_many(texts: List[str]) -> List[List[float]]:
+    """批量生成查询嵌入：多条文本合并为一个embed_documents调用
+
+    N条文本逐条调用embed_query要付N次TCP/TLS往返和服务端排队；
+    合并后接近一次往返加服务端批量计算。单条退化为aembed_query。
+    已见过的文本从进程内缓存直取，只有未命中的才进批量请求。
+
+    Args:
+        texts: 待嵌入的文本列表
+
+    Returns:
+        嵌入向量列表，与输入顺序一致
+    """
+    results: List[Optional[List[float]]] = [_embed_cache.get(text) for text in texts]
+    miss_indices = [i for i, vec in enumerate(results) if vec is None]
+    if not miss_indices:
+        return results
+
+    embedding_model = get_embedding()
+    miss_texts = [texts[i] for i in miss_indices]
+    if len(miss_texts) == 1:
+        miss_vectors = [await embedding_model.aembed_query(miss_texts[0])]
+    else:
+        miss_vectors = await embedding_model.aembed_documents(miss_texts)
+
+    for i, text, vector in zip(miss_indices, miss_texts, miss_vectors):
+        results[i] = vector
+        _embed_cache[text] = vector
+    while len(_embed_cache) > _EMBED_CACHE_MAX:
+        _embed_cache.popitem(last=False)
+    return results
+
+
+async def _search_and_filter(query: str, query_embedding: List[float], filter_dict):
+    """单个查询的向量检索+阈值过滤（同步客户端进线程池）"""
+    vector_store = get_vector_store()
+    search_results = await asyncio.to_thread(
+        vector_store.search,
+        query_embedding=query_embedding,
+        top_k=config.rag.top_k,
+        filter_dict=filter_dict,
+    )
+    return _filter_search_results(search_results, query)
+
+
+async def retrieve(state: GraphRAGState) -> Dict[str, Any]:
     """检索节点：从向量数据库检索相关文档（支持子查询）
-    
+
+    子查询一次性并发处理：嵌入用一个aembed_documents批量调用，
+    向量检索用asyncio.gather同时发出，K个子查询的延迟从K次往返
+    降到约一次往返，也省掉了图运行时逐个重入本节点的调度开销。
+
     Args:
         state: 当前状态
         
     Returns:
         更新的状态
     """
-    # 检查是否有子查询需要处理
     sub_queries = state.get('sub_queries', [])
-    sub_query_results = state.get('sub_query_results', {})
-    
-    # 如果有子查询且还未全部检索完，处理子查询
-    if sub_queries and len(sub_query_results) < len(sub_queries):
-        # 找到还未检索的子查询
-        remaining_queries = [sq for sq in sub_queries if sq not in sub_query_results]
-        if remaining_queries:
-            current_query = remaining_queries[0]
-            logger.info(f"开始检索子查询 [{len(sub_query_results)+1}/{len(sub_queries)}]: {current_query}")
-        else:
-            # 所有子查询都已检索，进入汇总阶段
-            return aggregate_results(state)
-    else:
-        # 没有子查询，使用原查询
-        current_query = state['query']
-        logger.info(f"开始检索，查询: {current_query}")
-    
+
+    # 构建过滤条件
+    filter_dict = None
+    if state.get('user_id'):
+        filter_dict = {"user_id": state['user_id']}
+
+    if sub_queries:
+        logger.info(f"并发检索 {len(sub_queries)} 个子查询")
+        try:
+            # 一次批量嵌入调用代替K次单条调用
+            embeddings = await embed_many(sub_queries)
+            outcomes = await asyncio.gather(
+                *[
+                    _search_and_filter(sq, emb, filter_dict)
+                    for sq, emb in zip(sub_queries, embeddings)
+                ],
+                return_exceptions=True,
+            )
+        except Exception as e:
+            logger.error(f"子查询批量检索失败: {e}")
+            return {"sub_query_results": {sq: [] for sq in sub_queries}}
+
+        sub_query_results = {}
+        for sub_query, outcome in zip(sub_queries, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"子查询 '{sub_query}' 检索失败: {outcome}")
+                sub_query_results[sub_query] = []
+            else:
+                sub_query_results[sub_query] = outcome[0]
+
+        logger.info("所有子查询检索完成，准备汇总结果")
+        return {"sub_query_results": sub_query_results}
+
+    # 没有子查询，使用原查询
+    current_query = state['query']
+    logger.info(f"开始检索，查询: {current_query}")
+
     try:
-        # 生成查询向量
-        embedding_model = get_embedding()
-        query_embedding = embedding_model.embed_query(current_query)
-        
-        # 构建过滤条件
-        filter_dict = None
-        if state.get('user_id'):
-            filter_dict = {"user_id": state['user_id']}
-        
-        # 向量检索
-        vector_store = get_vector_store()
-        search_results = vector_store.search(
-            query_embedding=query_embedding,
-            top_k=config.rag.top_k,
-            filter_dict=filter_dict,
+        query_embedding = (await embed_many([current_query]))[0]
+        retrieved_chunks, retrieval_scores = await _search_and_filter(
+            current_query, query_embedding, filter_dict
         )
-        
-        # 过滤低相似度结果
-        retrieved_chunks = []
-        retrieval_scores = []
-        
-        logger.info(f"向量检索返回 {len(search_results)} 个结果")
-        for i, result in enumerate(search_results[:5]):  # 只记录前5个
-            logger.info(f"结果 {i+1}: 相似度={result.score:.4f}, 阈值={config.rag.similarity_threshold}")
-        
-        for result in search_results:
-            if result.score >= config.rag.similarity_threshold:
-                retrieved_chunks.append({
-                    "content": result.chunk.content,
-                    "metadata": result.chunk.metadata,
-                    "score": result.score,
-                    "sub_query": current_query,  # 标记来源子查询
-                })
-                retrieval_scores.append(result.score)
-        
-        logger.info(f"经过阈值过滤后，检索到 {len(retrieved_chunks)} 个相关文档块")
-        
-        # 如果没有结果且阈值过滤太严格，降低阈值重试
-        if len(retrieved_chunks) == 0 and len(search_results) > 0:
-            logger.warning(f"阈值 {config.rag.similarity_threshold} 过滤掉了所有结果，使用动态阈值")
-            # 使用动态阈值：取最高分的75%或0.3，取较大值（更宽松）
-            if search_results:
-                max_score = max(r.score for r in search_results)
-                # 动态阈值：最高分的75%，但至少0.3（更宽松，提高召回率）
-                dynamic_threshold = max(max_score * 0.75, 0.3)
-                logger.info(f"最高分: {max_score:.4f}, 使用动态阈值: {dynamic_threshold:.4f}")
-                
-                for result in search_results:
-                    if result.score >= dynamic_threshold:
-                        retrieved_chunks.append({
-                            "content": result.chunk.content,
-                            "metadata": result.chunk.metadata,
-                            "score": result.score,
-                            "sub_query": current_query,  # 标记来源子查询
-                        })
-                        retrieval_scores.append(result.score)
-                
-                logger.info(f"使用动态阈值后，检索到 {len(retrieved_chunks)} 个相关文档块")
-        
-        # 如果有子查询，保存当前子查询的结果
-        if sub_queries:
-            sub_query_results[current_query] = retrieved_chunks
-            # 检查是否所有子查询都已检索完
-            # 保存当前子查询的检索结果
-            sub_query_results[current_query] = retrieved_chunks
-            
-            if len(sub_query_results) >= len(sub_queries):
-                # 所有子查询检索完成，进入汇总
-                logger.info(f"所有子查询检索完成，准备汇总结果")
-                return {
-                    "sub_query_results": sub_query_results,
-                }
-            else:
-                # 还有子查询未检索，继续检索下一个
-                return {
-                    "sub_query_results": sub_query_results,
-                }
-        
+
         return {
             "retrieved_chunks": retrieved_chunks,
             "retrieval_scores": retrieval_scores,
@@ -252,14 +534,6 @@ def retrieve(state: GraphRAGState) -> Dict[str, Any]:
         
     except Exception as e:
         logger.error(f"检索失败: {e}")
-        # 如果有子查询，标记当前子查询检索失败
-        if sub_queries:
-            sub_query_results[current_query] = []
-            if len(sub_query_results) >= len(sub_queries):
-                return aggregate_results(state)
-            return {
-                "sub_query_results": sub_query_results,
-            }
         return {
             "retrieved_chunks": [],
             "retrieval_scores": [],
@@ -267,6 +541,42 @@ def retrieve(state: GraphRAGState) -> Dict[str, Any]:
         }
 
 
+# 近重复判定的余弦相似度阈值
+_NEAR_DUP_SIM_THRESHOLD = 0.95
+
+
+def _drop_near_duplicates(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """用检索时带回的嵌入去掉近重复块（hash只能去掉完全相同的）
+
+    候选矩阵归一化后一次矩阵乘得到两两余弦，按分数从高到低贪心保留，
+    与已保留块相似度超过阈值的丢弃。候选数为rerank_top_k的2倍量级，
+    整个计算是一次微秒级的小GEMM。缺嵌入的后端退化为不做近重复去重。
+
+    Args:
+        chunks: 按分数降序排列的候选块列表
+
+    Returns:
+        去掉近重复后的块列表（保持原顺序）
+    """
+    if len(chunks) < 2 or any(chunk.get('embedding') is None for chunk in chunks):
+        return chunks
+
+    embeddings = np.asarray([chunk['embedding'] for chunk in chunks], dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    embeddings /= norms
+    similarity = embeddings @ embeddings.T
+
+    kept_indices: List[int] = []
+    for i in range(len(chunks)):
+        if all(similarity[i, j] < _NEAR_DUP_SIM_THRESHOLD for j in kept_indices):
+            kept_indices.append(i)
+
+    if len(kept_indices) < len(chunks):
+        logger.info(f"近重复去重：{len(chunks)} -> {len(kept_indices)} 个文档块")
+    return [chunks[i] for i in kept_indices]
+
+
 def aggregate_results(state: GraphRAGState) -> Dict[str, Any]:
     """汇总节点：汇总所有子查询的检索结果
     
@@ -285,28 +595,35 @@ def aggregate_results(state: GraphRAGState) -> Dict[str, Any]:
     
     logger.info(f"开始汇总 {len(sub_queries)} 个子查询的检索结果")
     
-    # 汇总所有子查询的结果
-    all_chunks = []
-    all_scores = []
-    
+    total = 0
     for sub_query, chunks in sub_query_results.items():
         logger.info(f"子查询 '{sub_query}' 检索到 {len(chunks)} 个文档块")
-        all_chunks.extend(chunks)
-        all_scores.extend([chunk.get('score', 0.0) for chunk in chunks])
-    
-    # 去重：基于内容相似度去重（简单版本：基于内容hash）
+        total += len(chunks)
+
+    # 每个子查询的结果本身就按分数降序（向量库排好序返回），
+    # heapq.merge按这个序做K路归并，凑够候选数立即停——尾部低分块
+    # 连hash都不用算。降序归并里同内容的首次出现就是最高分，
+    # 重复hash直接跳过。完整内容hash去重：金融文档的块常共享同一段
+    # 样板开头，截断hash会把不同块误判为重复
+    keep = config.rag.rerank_top_k * 2
     seen_content = set()
     unique_chunks = []
-    unique_scores = []
-    
-    for chunk in all_chunks:
-        content_hash = hash(chunk['content'][:100])  # 使用前100字符作为hash
-        if content_hash not in seen_content:
-            seen_content.add(content_hash)
-            unique_chunks.append(chunk)
-            unique_scores.append(chunk.get('score', 0.0))
+    merged = heapq.merge(
+        *sub_query_results.values(), key=lambda chunk: -chunk.get('score', 0.0)
+    )
+    for chunk in merged:
+        content_hash = hash(chunk['content'])
+        if content_hash in seen_content:
+            continue
+        seen_content.add(content_hash)
+        unique_chunks.append(chunk)
+        if len(unique_chunks) >= keep:
+            break
+
+    unique_chunks = _drop_near_duplicates(unique_chunks)
+    unique_scores = [chunk.get('score', 0.0) for chunk in unique_chunks]
     
-    logger.info(f"汇总完成：原始 {len(all_chunks)} 个文档块，去重后 {len(unique_chunks)} 个文档块")
+    logger.info(f"汇总完成：原始 {total} 个文档块，去重后保留 {len(unique_chunks)} 个文档块")
     
     return {
         "retrieved_chunks": unique_chunks,
@@ -315,14 +632,26 @@ def aggregate_results(state: GraphRAGState) -> Dict[str, Any]:
     }
 
 
-def rerank(state: GraphRAGState) -> Dict[str, Any]:
-    """重排序节点：使用语义模型对检索结果进行重排序，提升相关性
-    
+class RerankReflect(BaseModel):
+    """重排序+充分性评估的结构化输出（function-calling模式）"""
+
+    ranking: List[int] = Field(description="按相关性从高到低的文档索引，从1开始")
+    sufficient: bool = Field(description="检索内容是否足以回答用户问题")
+    reason: str = Field(description="充分性判断的简要理由")
+
+
+async def rerank(state: GraphRAGState) -> Dict[str, Any]:
+    """重排序节点：一次LLM调用同时完成重排序与检索充分性评估
+
+    原先重排序和反思各付一次完整的LLM网络+排队往返；结构化输出把
+    两个判断合进同一个prompt，反思节点直接复用这里的充分性结论，
+    每轮图运行省下一次往返。
+
     Args:
         state: 当前状态
         
     Returns:
-        更新的状态
+        更新的状态（重排序结果及充分性结论）
     """
     retrieved_chunks = state.get('retrieved_chunks', [])
     
@@ -332,64 +661,48 @@ def rerank(state: GraphRAGState) -> Dict[str, Any]:
             "reranked_chunks": retrieved_chunks,
         }
     
-    logger.info(f"开始重排序，输入 {len(retrieved_chunks)} 个文档块")
+    logger.info(f"开始重排序+充分性评估，输入 {len(retrieved_chunks)} 个文档块")
     
     try:
-        llm = get_llm()
+        llm = get_llm().with_structured_output(RerankReflect)
         query = state['query']
         
-        # 构建重排序提示词
-        chunks_text = "\n\n".join([
-            f"[文档 {i+1}] (相似度: {chunk.get('score', 0):.4f})\n{chunk['content'][:500]}"
+        # 构建重排序提示词（预览字段在检索时已截好）
+        chunks_text = "\n\n".join(
+            f"[文档 {i+1}] (相似度: {chunk.get('score', 0):.4f})\n{chunk.get('content_preview') or chunk['content'][:500]}"
             for i, chunk in enumerate(retrieved_chunks)
-        ])
+        )
         
-        rerank_prompt = f"""你是一个专业的文档相关性评估专家。请根据用户问题，对以下检索到的文档块进行重排序，选出最相关的文档。
+        rerank_prompt = _RERANK_REFLECT_PROMPT.format(query=query, chunks_text=chunks_text)
 
-用户问题: {query}
+        verdict: RerankReflect = await llm.ainvoke([HumanMessage(content=rerank_prompt)])
 
-检索到的文档块:
-{chunks_text}
-
-请评估每个文档与问题的相关性，并返回最相关的文档索引（从1开始），按相关性从高到低排列。
-只返回数字，用逗号分隔，例如：3,1,5,2,4
-
-最相关的文档索引（按相关性排序）："""
-        
-        response = llm.invoke([HumanMessage(content=rerank_prompt)]).content.strip()
-        
-        # 解析返回的索引
-        try:
-            indices = [int(x.strip()) - 1 for x in response.split(',') if x.strip().isdigit()]
-            # 过滤有效索引
-            valid_indices = [i for i in indices if 0 <= i < len(retrieved_chunks)]
-            
-            if valid_indices:
-                # 按重排序后的顺序排列
-                reranked = [retrieved_chunks[i] for i in valid_indices]
-                # 添加剩余未排序的文档
-                remaining_indices = set(range(len(retrieved_chunks))) - set(valid_indices)
-                reranked.extend([retrieved_chunks[i] for i in remaining_indices])
-            else:
-                # 如果解析失败，保持原顺序
-                reranked = retrieved_chunks
-        except Exception as e:
-            logger.warning(f"解析重排序结果失败: {e}，保持原顺序")
+        # 过滤有效索引并按重排序后的顺序排列
+        valid_indices = [i - 1 for i in verdict.ranking if 1 <= i <= len(retrieved_chunks)]
+        if valid_indices:
+            reranked = [retrieved_chunks[i] for i in valid_indices]
+            remaining_indices = set(range(len(retrieved_chunks))) - set(valid_indices)
+            reranked.extend(retrieved_chunks[i] for i in remaining_indices)
+        else:
+            # 如果排序为空，保持原顺序
             reranked = retrieved_chunks
         
         # 只保留前 rerank_top_k 个
         reranked = reranked[:config.rag.rerank_top_k]
         
-        logger.info(f"重排序完成，保留 {len(reranked)} 个最相关的文档块")
+        logger.info(f"重排序完成，保留 {len(reranked)} 个最相关的文档块，充分性: {verdict.sufficient}")
         
         return {
             "reranked_chunks": reranked,
+            "retrieval_sufficient": verdict.sufficient,
+            "reflection_result": verdict.reason,
         }
         
     except Exception as e:
         logger.error(f"重排序失败: {e}")
         return {
             "reranked_chunks": retrieved_chunks[:config.rag.rerank_top_k],
+            "retrieval_sufficient": None,
         }
 
 
@@ -414,27 +727,12 @@ def web_search(state: GraphRAGState) -> Dict[str, Any]:
     logger.info(f"开始网络搜索: {query}")
     
     try:
-        # 尝试导入Tavily
-        try:
-            from tavily import TavilyClient
-        except ImportError as e:
-            logger.error(f"【web_search】Tavily未安装: {e}，请运行：pip install tavily-python")
-            logger.error(f"【web_search】如果已安装，请运行：pip install -e . 重新安装项目依赖")
+        client = get_tavily_client()
+        if client is None:
             return {
                 "web_search_results": [],
             }
         
-        # 获取API密钥
-        tavily_api_key = os.getenv("TAVILY_API_KEY")
-        if not tavily_api_key:
-            logger.warning("TAVILY_API_KEY未设置，跳过网络搜索")
-            return {
-                "web_search_results": [],
-            }
-        
-        # 初始化Tavily客户端
-        client = TavilyClient(api_key=tavily_api_key)
-        
         # 执行搜索
         response = client.search(
             query=query,
@@ -466,7 +764,7 @@ def web_search(state: GraphRAGState) -> Dict[str, Any]:
         }
 
 
-def reflect(state: GraphRAGState) -> Dict[str, Any]:
+async def reflect(state: GraphRAGState) -> Dict[str, Any]:
     """反思节点：评估检索结果是否满足查询需求
     
     Args:
@@ -484,42 +782,82 @@ def reflect(state: GraphRAGState) -> Dict[str, Any]:
     logger.info("开始反思阶段")
     
     try:
-        llm = get_llm()
-        
-        # 构建反思提示词
-        retrieved_texts = "\n\n".join([
-            f"[文档 {i+1}]\n{chunk['content'][:500]}\n相似度: {chunk['score']:.3f}"
-            for i, chunk in enumerate(state.get('retrieved_chunks', [])[:3])
-        ])
-        
-        reflection_prompt = f"""你是一个金融文档检索质量评估专家。请评估以下检索结果是否充分回答了用户的问题。
-
-用户问题: {state['query']}
+        # 状态字段各读一次，绑定到局部变量
+        query = state['query']
+        retrieved_chunks = state.get('retrieved_chunks', [])
+        iteration_count = state.get('iteration_count', 0)
+        top_chunks = retrieved_chunks[:3]  # 指纹和提示词都只看前3块，切片一次
 
-检索到的文档:
-{retrieved_texts if retrieved_texts else "未检索到相关文档"}
+        # 重排序阶段的融合调用已经给出充分性结论时直接复用，不再发LLM
+        fused_verdict = state.get('retrieval_sufficient')
+        if fused_verdict is not None:
+            logger.info("复用重排序阶段的充分性评估，跳过反思LLM调用")
+            return {
+                "reflection_result": state.get('reflection_result') or (
+                    "检索充分，可以直接生成答案" if fused_verdict else "检索结果不充分"
+                ),
+                "needs_iteration": not fused_verdict and iteration_count < config.rag.max_iterations,
+            }
 
-请从以下角度评估：
-1. 检索结果的相关性（是否与问题相关）
-2. 信息的完整性（是否包含回答问题的关键信息）
-3. 是否需要更精确的检索策略
+        # 明显情形走启发式快速路径，不花一次LLM往返：
+        # 空结果必然不充分；前3条分数都很高时直接判充分。
+        # 只有中间地带才交给LLM评估。
+        if not retrieved_chunks:
+            logger.info("无检索结果，直接判定不充分")
+            return {
+                "reflection_result": "未检索到相关文档，检索结果不充分",
+                "needs_iteration": iteration_count < config.rag.max_iterations,
+            }
+        if (
+            len(top_chunks) == 3
+            and top_chunks[0]['score'] > 0.9
+            and top_chunks[2]['score'] > 0.75
+        ):
+            logger.info("检索分数极高，直接判定充分")
+            return {
+                "reflection_result": "检索结果相似度极高，信息充分，可以回答查询",
+                "needs_iteration": False,
+            }
 
-请用简洁的中文回答：
-- 如果检索结果充分，回答"检索充分，可以直接生成答案"
-- 如果需要改进，指出问题并建议改进方向
+        # 查询+参评块组合出现过就直接复用结论，省一次LLM往返
+        # （needs_iteration受迭代计数影响，只缓存内容层面的判断）
+        cache_key = (_normalize_query(query), _chunk_fingerprints(top_chunks))
+        cached = _reflection_cache.get(cache_key)
+        if cached is not None:
+            reflection_result, insufficient = cached
+            logger.info("反思结论缓存命中，跳过LLM评估")
+            return {
+                "reflection_result": reflection_result,
+                "needs_iteration": insufficient and iteration_count < config.rag.max_iterations,
+            }
 
-评估结果："""
+        llm = get_llm()
         
-        reflection_result = llm.invoke([HumanMessage(content=reflection_prompt)]).content
+        # 构建反思提示词（生成器表达式直接喂join，不物化中间列表）
+        retrieved_texts = "\n\n".join(
+            f"[文档 {i+1}]\n{chunk['content_preview']}\n相似度: {chunk['score']:.3f}"
+            for i, chunk in enumerate(top_chunks)
+        )
+        
+        reflection_prompt = _REFLECTION_PROMPT.format(
+            query=query,
+            retrieved_texts=retrieved_texts if retrieved_texts else "未检索到相关文档",
+        )
+        
+        reflection_result = (await llm.ainvoke([HumanMessage(content=reflection_prompt)])).content
         
         # 判断是否需要迭代
-        needs_iteration = (
+        insufficient = (
             "不充分" in reflection_result or
             "需要改进" in reflection_result or
-            "不足" in reflection_result or
-            len(state.get('retrieved_chunks', [])) == 0
-        ) and state.get('iteration_count', 0) < config.rag.max_iterations
-        
+            "不足" in reflection_result
+        )
+        needs_iteration = insufficient and iteration_count < config.rag.max_iterations
+
+        _reflection_cache[cache_key] = (reflection_result, insufficient)
+        while len(_reflection_cache) > _REFLECTION_CACHE_MAX:
+            _reflection_cache.popitem(last=False)
+
         logger.info(f"反思结果: {reflection_result[:100]}...")
         logger.info(f"是否需要迭代: {needs_iteration}")
         
@@ -536,7 +874,7 @@ def reflect(state: GraphRAGState) -> Dict[str, Any]:
         }
 
 
-def refine_query(state: GraphRAGState) -> Dict[str, Any]:
+async def refine_query(state: GraphRAGState) -> Dict[str, Any]:
     """优化查询节点：基于反思结果优化查询
     
     Args:
@@ -546,27 +884,19 @@ def refine_query(state: GraphRAGState) -> Dict[str, Any]:
         更新的状态
     """
     logger.info("开始优化查询")
-    
-    try:
-        llm = get_llm()
-        
-        refine_prompt = f"""基于以下反思结果，请优化用户的查询问题，使其更适合文档检索。
-
-原始问题: {state['query']}
 
-反思结果: {state.get('reflection_result', '')}
-
-请生成一个更精确的查询问题，要求：
-1. 保持问题的核心意图
-2. 增加更具体的关键词
-3. 如果原始问题模糊，使其更加明确
+    query = state['query']
+    iteration_count = state.get('iteration_count', 0) + 1
 
-优化后的问题："""
+    try:
+        llm = get_llm()
         
-        refined_query = llm.invoke([HumanMessage(content=refine_prompt)]).content.strip()
+        refine_prompt = _REFINE_PROMPT.format(
+            query=query,
+            reflection_result=state.get('reflection_result', ''),
+        )
         
-        # 更新迭代计数
-        iteration_count = state.get('iteration_count', 0) + 1
+        refined_query = (await llm.ainvoke([HumanMessage(content=refine_prompt)])).content.strip()
         
         logger.info(f"优化后的查询: {refined_query}")
         
@@ -579,17 +909,19 @@ def refine_query(state: GraphRAGState) -> Dict[str, Any]:
     except Exception as e:
         logger.error(f"优化查询失败: {e}")
         return {
-            "refined_query": state['query'],  # 保持原查询
-            "iteration_count": state.get('iteration_count', 0) + 1,
+            "refined_query": query,  # 保持原查询
+            "iteration_count": iteration_count,
         }
 
 
-def generate_answer(state: GraphRAGState) -> Dict[str, Any]:
+async def generate_answer(state: GraphRAGState, store_cache: bool = True) -> Dict[str, Any]:
     """生成答案节点：基于检索结果生成最终答案
-    
+
     Args:
         state: 当前状态
-        
+        store_cache: 生成后是否立即写入答案缓存；投机调用传False，
+            由reflect_and_generate在反思判定通过后再写（见_pending键）
+
     Returns:
         更新的状态
     """
@@ -597,25 +929,62 @@ def generate_answer(state: GraphRAGState) -> Dict[str, Any]:
     
     try:
         llm = get_llm()
-        
+
+        query = state['query']
+
         # 优先使用重排序后的结果，如果没有则使用原始检索结果
         chunks_to_use = state.get('reranked_chunks', []) or state.get('retrieved_chunks', [])
-        
-        # 构建上下文（知识库内容）
-        context_texts = "\n\n".join([
-            f"[知识库文档 {i+1}] (相似度: {chunk.get('score', 0):.4f})\n{chunk['content']}\n"
-            for i, chunk in enumerate(chunks_to_use)
-        ])
+
+        query_key = _normalize_query(query)
+        chunk_ids = _chunk_fingerprints(chunks_to_use)
+
+        # L1：规范化查询完全一致且检索块集合足够重合，直接复用答案
+        cached = _answer_cache.get(query_key)
+        if cached is not None and _jaccard(cached[1], chunk_ids) >= _ANSWER_JACCARD_THRESHOLD:
+            logger.info("答案缓存命中（查询一致），跳过LLM生成")
+            return {"final_answer": cached[2]}
+
+        # L2：语义近邻匹配；仅当缓存非空才额外付一次嵌入调用（远比LLM生成便宜）
+        query_embedding = None
+        if _answer_cache:
+            try:
+                query_embedding = (await embed_many([query]))[0]
+                cached_answer = _answer_cache_lookup_semantic(query_embedding, chunk_ids)
+                if cached_answer is not None:
+                    logger.info("答案缓存命中（语义相似），跳过LLM生成")
+                    return {"final_answer": cached_answer}
+            except Exception as e:
+                logger.warning(f"答案缓存查找失败（继续正常生成）: {e}")
+
+        # 检索文档按内容哈希排序形成稳定前缀：反思迭代之间块集合大量重叠，
+        # 文档顺序和文本字节级一致时，LLM服务端的自动前缀KV缓存可直接命中，
+        # 省掉对相同文档token的重复prefill（相似度分随迭代变化，不放进提示词）
+        chunks_to_use = sorted(chunks_to_use, key=lambda c: hash(c['content']))
+
+        # 构建上下文（知识库内容）：每块截断到上限字符数——提示词体积
+        # 直接决定prefill开销和网络传输量；前200字符相同的块视为
+        # 同一来源的切分重叠（常见于切分后的PDF），只保留先见到的那块
+        max_chars = config.rag.max_chunk_chars
+        seen_prefixes = set()
+        context_parts = []
+        for chunk in chunks_to_use:
+            content = chunk['content']
+            prefix = content[:200]
+            if prefix in seen_prefixes:
+                continue
+            seen_prefixes.add(prefix)
+            context_parts.append(f"[知识库文档 {len(context_parts) + 1}]\n{content[:max_chars]}\n")
+        context_texts = "\n\n".join(context_parts)
         
         # 构建网络搜索结果上下文
         web_results = state.get('web_search_results', [])
         web_context = ""
         if web_results:
             web_context = "\n\n=== 网络搜索结果 ===\n\n"
-            web_context += "\n\n".join([
+            web_context += "\n\n".join(
                 f"[网络来源 {i+1}] {result.get('title', '')}\nURL: {result.get('url', '')}\n内容: {result.get('content', '')[:500]}\n"
                 for i, result in enumerate(web_results)
-            ])
+            )
         
         # 获取子查询信息（如果有）
         sub_queries = state.get('sub_queries', [])
@@ -625,48 +994,38 @@ def generate_answer(state: GraphRAGState) -> Dict[str, Any]:
             for i, sq in enumerate(sub_queries, 1):
                 sub_query_info += f"{i}. {sq}\n"
         
-        # 构建系统提示词（金融领域特化，要求生成投资意见）
-        system_prompt = """你是一个专业的金融投资顾问AI助手，擅长分析企业财报、投融资报告等金融文档。
-
-你的职责：
-1. 基于提供的文档内容和网络搜索结果，准确回答用户问题
-2. 回答要专业、准确，引用具体数据
-3. 综合分析所有信息（包括从多个子查询检索到的信息），给出专业的投资建议
-4. 使用中文回答，保持专业术语的准确性
-
-重要原则：
-- 优先使用知识库文档内容，网络搜索结果作为补充
-- 如果信息不足，明确指出缺失的部分
-- 涉及财务数据时，要准确引用数字和单位
-- 综合分析所有子查询的结果，形成完整的答案
-- 最后必须提供一条明确的投资意见或建议"""
-        
-        user_prompt = f"""基于以下信息，回答用户问题并提供投资建议。
-{sub_query_info}
-=== 知识库文档内容 ===
-{context_texts if context_texts else "未检索到相关文档"}
-{web_context}
-
-用户问题: {state['query']}
-
-请按以下格式回答：
-1. 首先综合分析所有检索到的信息，回答用户的具体问题
-2. 引用相关的数据和分析（如果涉及多个实体，分别说明）
-3. 最后提供一条明确的投资意见或建议
-
-回答："""
+        user_prompt = _USER_PROMPT.format(
+            context_texts=context_texts if context_texts else "未检索到相关文档",
+            web_context=web_context,
+            sub_query_info=sub_query_info,
+            query=query,
+        )
         
         messages = [
-            SystemMessage(content=system_prompt),
+            SystemMessage(content=_SYSTEM_PROMPT),
             HumanMessage(content=user_prompt),
         ]
         
-        final_answer = llm.invoke(messages).content
-        
+        # 流式消费：token边生成边到达，astream_events的调用方可以在
+        # 首token后就开始渲染，而不是等整个答案decode完
+        parts = []
+        async for piece in llm.astream(messages):
+            if not parts:
+                logger.info("答案首token已到达")
+            parts.append(piece.content)
+        final_answer = "".join(parts)
+
         logger.info(f"生成答案完成，长度: {len(final_answer)}")
-        
+
+        if store_cache:
+            _answer_cache_store(query_key, query_embedding, chunk_ids, final_answer)
+            return {"final_answer": final_answer}
+
+        # 投机生成：答案可能被反思否决，写缓存的材料随结果带出，
+        # 调用方确认采用后再落缓存
         return {
             "final_answer": final_answer,
+            "_pending_answer_cache": (query_key, query_embedding, chunk_ids, final_answer),
         }
         
     except Exception as e:
@@ -675,3 +1034,79 @@ def generate_answer(state: GraphRAGState) -> Dict[str, Any]:
             "final_answer": f"生成答案时出错: {e}",
         }
 
+
+async def reflect_and_generate(state: GraphRAGState) -> Dict[str, Any]:
+    """投机并行节点：反思与答案生成同时发起
+
+    多数查询反思结论是"检索充分"，串行等待反思再开始生成白白浪费
+    一次LLM往返。这里两个调用并发起跑：反思判定需要迭代时取消生成
+    任务（多付的只是被取消请求已生成的token），否则直接拿到已在途
+    的答案，把生成延迟藏进反思延迟里。
+
+    Args:
+        state: 当前状态
+
+    Returns:
+        更新的状态（反思字段，必要时含final_answer）
+    """
+    if not config.rag.enable_reflection:
+        result = await generate_answer(state)
+        result.update({"reflection_result": "反思已禁用", "needs_iteration": False})
+        return result
+
+    # 投机生成的答案先不写缓存：反思若判定检索不充分，被否决的答案
+    # 缓存后会让同一问题的重问直接命中错误答案而不再迭代
+    reflect_task = asyncio.create_task(reflect(state))
+    answer_task = asyncio.create_task(generate_answer(state, store_cache=False))
+
+    reflection = await reflect_task
+
+    if reflection.get("needs_iteration"):
+        # 需要迭代：答案会被重新生成，取消在途的投机生成
+        answer_task.cancel()
+        try:
+            await answer_task
+        except asyncio.CancelledError:
+            pass
+        logger.info("反思要求迭代，已取消投机生成的答案")
+        return reflection
+
+    # 反思通过，答案被采用，此时才落答案缓存
+    answer = await answer_task
+    pending = answer.pop("_pending_answer_cache", None)
+    if pending is not None:
+        _answer_cache_store(*pending)
+    return {**reflection, **answer}
+
+
+async def retrieve_pipeline(state: GraphRAGState) -> Dict[str, Any]:
+    """融合节点：检索→聚合→重排序/网络搜索在一次节点执行内完成
+
+    拆成四个节点时，每一跳都要把大块的retrieved_chunks经图运行时
+    的通道合并/复制一遍，再加一次条件边调度；融合后中间结果在
+    进程内直接传递，只在节点边界写回一次。各子函数保持独立，
+    便于单独测试。
+
+    Args:
+        state: 当前状态
+
+    Returns:
+        更新的状态（检索、聚合及重排序/网络搜索的全部产出）
+    """
+    updates: Dict[str, Any] = await retrieve(state)
+    merged = {**state, **updates}
+
+    if merged.get('sub_queries'):
+        updates.update(aggregate_results(merged))
+        merged.update(updates)
+
+    if merged.get('use_web_search') or not merged.get('retrieved_chunks'):
+        # Tavily客户端是同步API，进线程池避免阻塞事件循环
+        updates.update(await asyncio.to_thread(web_search, merged))
+    else:
+        updates.update(await rerank(merged))
+
+    # 本轮没产出充分性结论时显式清掉上一轮的，防止反思复用过期结果
+    updates.setdefault('retrieval_sufficient', None)
+
+    return updates
@@ -1,9 +1,72 @@
 """图RAG状态定义"""
 
+from dataclasses import dataclass, field
 from typing import TypedDict, List, Dict, Any, Optional,Annotated
 from langchain_core.messages import BaseMessage
 from operator import add
 
+import numpy as np
+
+
+@dataclass(slots=True)
+class RetrievedBatch:
+    """检索结果的列式存储（SoA）
+
+    list[dict]每条结果都是一个独立dict，字段访问和复制的逐项开销大；
+    列式布局把分数收进一个float32数组，支持向量化的阈值过滤和top-k，
+    文本/元数据各自成列。节点边界仍输出dict列表，保持图状态协议不变。
+    """
+
+    contents: List[str] = field(default_factory=list)
+    previews: List[str] = field(default_factory=list)
+    metadata: List[Dict[str, Any]] = field(default_factory=list)
+    embeddings: List[Optional[List[float]]] = field(default_factory=list)
+    scores: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+
+    @classmethod
+    def from_results(cls, search_results) -> "RetrievedBatch":
+        """从向量检索结果构建列式批（每列一次遍历）"""
+        return cls(
+            contents=[r.chunk.content for r in search_results],
+            previews=[r.chunk.content[:500] for r in search_results],
+            metadata=[r.chunk.metadata for r in search_results],
+            embeddings=[r.chunk.embedding for r in search_results],
+            scores=np.fromiter(
+                (r.score for r in search_results),
+                dtype=np.float32,
+                count=len(search_results),
+            ),
+        )
+
+    def select(self, indices) -> "RetrievedBatch":
+        """按行索引取子集（用于阈值过滤后的收缩）"""
+        return RetrievedBatch(
+            contents=[self.contents[i] for i in indices],
+            previews=[self.previews[i] for i in indices],
+            metadata=[self.metadata[i] for i in indices],
+            embeddings=[self.embeddings[i] for i in indices],
+            scores=self.scores[indices],
+        )
+
+    def to_chunks(self, sub_query: str) -> List[Dict[str, Any]]:
+        """转回节点边界使用的dict列表"""
+        return [
+            {
+                "content": content,
+                "content_preview": preview,
+                "metadata": meta,
+                "embedding": embedding,
+                "score": float(score),
+                "sub_query": sub_query,
+            }
+            for content, preview, meta, embedding, score in zip(
+                self.contents, self.previews, self.metadata, self.embeddings, self.scores
+            )
+        ]
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
 
 class GraphRAGState(TypedDict):
     """图RAG状态
@@ -38,6 +101,7 @@ class GraphRAGState(TypedDict):
     # 反思阶段
     reflection_result: Optional[str]
     needs_iteration: bool
+    retrieval_sufficient: Optional[bool]  # 融合重排序调用给出的充分性结论（None表示本轮未评估）
     
     # 迭代阶段
     iteration_count: int
@@ -1,10 +1,21 @@
 """嵌入向量生成工具"""
 
+import functools
 from typing import List
 from langchain_openai import OpenAIEmbeddings
 from agent.config import config
 
 
+@functools.cache
+def _get_embedding_model() -> OpenAIEmbeddings:
+    """模块级共享的嵌入客户端（每次调用新建会重复付出httpx客户端构建开销）"""
+    return OpenAIEmbeddings(
+        model=config.embedding.model_name,
+        openai_api_key=config.llm.api_key,
+        openai_api_base=config.llm.base_url,
+    )
+
+
 def generate_embedding(text: str) -> List[float]:
     """生成单个文本的嵌入向量
     
@@ -14,16 +25,11 @@ def generate_embedding(text: str) -> List[float]:
     Returns:
         嵌入向量
     """
-    embedding_model = OpenAIEmbeddings(
-        model=config.embedding.model_name,
-        openai_api_key=config.llm.api_key,
-        openai_api_base=config.llm.base_url,
-    )
-    return embedding_model.embed_query(text)
+    return _get_embedding_model().embed_query(text)
 
 
 def generate_embeddings(texts: List[str]) -> List[List[float]]:
-    """批量生成嵌入向量
+    """批量生成嵌入向量：一次embed_documents请求，而非逐条往返
     
     Args:
         texts: 文本列表
@@ -31,11 +37,4 @@ def generate_embeddings(texts: List[str]) -> List[List[float]]:
     Returns:
         嵌入向量列表
     """
-    embedding_model = OpenAIEmbeddings(
-        model=config.embedding.model_name,
-        openai_api_key=config.llm.api_key,
-        openai_api_base=config.llm.base_url,
-    )
-    return embedding_model.embed_documents(texts)
-
-
+    return _get_embedding_model().embed_documents(texts)
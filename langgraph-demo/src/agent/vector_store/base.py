@@ -1,16 +1,27 @@
 """向量数据库抽象基类，定义统一的接口"""
 
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
+import numpy as np
+
+# 检索结果缓存：条目上限、TTL（秒）、参与缓存的top_k上限
+# （超大top_k多为一次性导出查询，缓存只会挤掉热点条目）
+_SEARCH_CACHE_MAX = 256
+_SEARCH_CACHE_TTL = 30.0
+_SEARCH_CACHE_TOP_K_LIMIT = 100
+
 
 class VectorStoreError(Exception):
     """向量存储异常"""
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentChunk:
     """文档分块"""
     id: str
@@ -19,7 +30,7 @@ class DocumentChunk:
     embedding: Optional[List[float]] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """检索结果"""
     chunk: DocumentChunk
@@ -31,8 +42,93 @@ class VectorStore(ABC):
     
     实现开闭原则：对扩展开放，对修改关闭
     新增向量数据库只需实现此接口，无需修改其他代码
+
+    附带一个可选的检索结果缓存（LRU+TTL）：反思迭代和批量评测会
+    用完全相同的向量与过滤条件重复检索，后端实现可在search开头查
+    缓存、命中直接返回，写入/删除后调用失效方法保证读到新数据。
+    缓存状态按需懒初始化，子类无需在__init__里调用super().__init__。
     """
-    
+
+    # ------------------------------------------------------------------
+    # 检索结果缓存（供子类search/add_documents/delete调用）
+    # ------------------------------------------------------------------
+
+    # 懒初始化的类级守护锁：实例锁本身也在懒初始化之列，不能用它自保
+    _search_cache_init_lock = threading.Lock()
+
+    def _search_cache(self) -> "OrderedDict":
+        """懒初始化的缓存字典（LRU顺序，值为(存入时刻, 结果)）
+
+        先建实例锁、后发布数据字典：并发调用方以_search_cache_data
+        是否存在为初始化完成的信号，反过来赋值会让对方拿到字典却
+        撞上还没就位的锁。
+        """
+        cache = getattr(self, "_search_cache_data", None)
+        if cache is None:
+            with VectorStore._search_cache_init_lock:
+                cache = getattr(self, "_search_cache_data", None)
+                if cache is None:
+                    cache = OrderedDict()
+                    self._search_cache_lock = threading.Lock()
+                    self._search_cache_data = cache
+        return cache
+
+    def _search_cache_key(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        filter_dict: Optional[Dict[str, Any]],
+        collection_name: Optional[str],
+    ) -> Optional[tuple]:
+        """构造缓存键；不适合缓存的查询返回None
+
+        向量以float32字节串哈希——逐元素比较1536维列表比哈希一次
+        贵得多，且检索键只需等值语义。
+        """
+        if top_k > _SEARCH_CACHE_TOP_K_LIMIT:
+            return None
+        try:
+            vec_hash = hash(np.asarray(query_embedding, dtype=np.float32).tobytes())
+            filter_key = tuple(sorted(filter_dict.items())) if filter_dict else None
+            return (vec_hash, top_k, filter_key, collection_name)
+        except TypeError:
+            # 过滤值不可哈希（如list），放弃缓存
+            return None
+
+    def _search_cache_get(self, key: Optional[tuple]) -> Optional[List["SearchResult"]]:
+        """按键取缓存结果；未命中或已过期返回None"""
+        if key is None:
+            return None
+        cache = self._search_cache()
+        with self._search_cache_lock:
+            entry = cache.get(key)
+            if entry is None:
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at > _SEARCH_CACHE_TTL:
+                del cache[key]
+                return None
+            cache.move_to_end(key)
+            return results
+
+    def _search_cache_put(self, key: Optional[tuple], results: List["SearchResult"]) -> None:
+        """写入缓存并按LRU裁剪"""
+        if key is None:
+            return
+        cache = self._search_cache()
+        with self._search_cache_lock:
+            cache[key] = (time.monotonic(), results)
+            cache.move_to_end(key)
+            while len(cache) > _SEARCH_CACHE_MAX:
+                cache.popitem(last=False)
+
+    def _invalidate_search_cache(self) -> None:
+        """清空缓存（数据写入/删除后调用，避免读到陈旧结果）"""
+        cache = getattr(self, "_search_cache_data", None)
+        if cache is not None:
+            with self._search_cache_lock:
+                cache.clear()
+
     @abstractmethod
     def initialize(self) -> bool:
         """初始化向量数据库
@@ -1,5 +1,6 @@
 """向量数据库工厂类，支持高可用和多数据库切换"""
 
+import threading
 from typing import Optional, List
 from agent.vector_store.base import VectorStore
 from agent.vector_store.qdrant_store import QdrantVectorStore
@@ -65,7 +66,43 @@ class VectorStoreFactory:
                 VectorStoreFactory.create_vector_store(backup)
                 for backup in backup_configs
             ]
-            return HighAvailabilityVectorStore(primary_store, backup_stores)
-        
+            return HighAvailabilityVectorStore(
+                primary_store,
+                backup_stores,
+                enable_hedging=primary_config.enable_hedging,
+            )
+
         return primary_store
 
+
+# 进程级暖池：按(类型, 主机, 端口, 集合)键共享已初始化的后端实例。
+# 多worker部署（Gunicorn preload_app=True）时在主进程填充，fork后
+# 各worker以写时复制共享，不再每个worker重付建连+集合元数据开销
+_store_pool: dict = {}
+_store_pool_lock = threading.Lock()
+
+
+def get_vector_store(db_config: Optional[VectorDBConfig] = None) -> VectorStore:
+    """获取进程级共享的向量数据库实例（已初始化）
+
+    诊断脚本和前端复用同一个客户端连接，避免每次调用重新握手和建集合。
+    初始化涉及建连+建集合，用双重检查锁保证并发首调用只执行一次。
+
+    Args:
+        db_config: 数据库配置，None时使用全局配置
+
+    Returns:
+        VectorStore: 已初始化的共享实例
+    """
+    cfg = db_config or config.vector_db
+    key = (cfg.db_type, cfg.host, cfg.port, cfg.collection_name)
+    store = _store_pool.get(key)
+    if store is None:
+        with _store_pool_lock:
+            store = _store_pool.get(key)
+            if store is None:
+                store = VectorStoreFactory.create_vector_store(cfg)
+                store.initialize()
+                _store_pool[key] = store
+    return store
+
@@ -1,86 +1,310 @@
 """高可用向量存储包装器，支持故障转移和复制"""
 
+import fcntl
+import hashlib
 import logging
+import os
+import pickle
+import struct
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from pathlib import Path
 from typing import List, Dict, Any, Optional
-from agent.vector_store.base import VectorStore, DocumentChunk, SearchResult
+from agent.vector_store.base import VectorStore, VectorStoreError, DocumentChunk, SearchResult
 
 logger = logging.getLogger(__name__)
 
+# 复制日志根目录（每个HA实例在其下有独立的命名空间子目录）
+_WAL_ROOT = Path(os.getenv("VECTOR_WAL_DIR", "data/vector_wal"))
+
+# 记录头：小端uint32，记录体字节长度
+_RECORD_HEADER = struct.Struct("<I")
+
 
 class HighAvailabilityVectorStore(VectorStore):
     """高可用向量存储包装器
-    
-    实现故障转移和读写分离
+
+    实现故障转移和读写分离。写路径只等主库完成，复制通过
+    磁盘操作日志（WAL）异步进行：每条写操作先追加到日志，
+    每个备份一个复制线程按LSN顺序回放，失败退避重试——备份
+    短暂不可用时写不会丢，恢复后从上次应用位置继续追赶。
     """
-    
-    def __init__(self, primary: VectorStore, backups: List[VectorStore]):
+
+    def __init__(
+        self,
+        primary: VectorStore,
+        backups: List[VectorStore],
+        enable_hedging: bool = False,
+    ):
         """初始化高可用存储
-        
+
         Args:
             primary: 主数据库
             backups: 备份数据库列表
+            enable_hedging: 读对冲——检索同时发给主库和首个备份，
+                取先返回的成功结果，削掉主库偶发的尾延迟
         """
         self.primary = primary
         self.backups = backups
         self.current_store = primary
-    
+        # 常驻小线程池承载对冲请求，避免每次检索新建线程
+        self._hedge_pool = (
+            ThreadPoolExecutor(max_workers=2, thread_name_prefix="vs-hedge")
+            if enable_hedging and backups
+            else None
+        )
+        # 健康探测结果按TTL复用：每次读写前都发一次health_check会让
+        # 热路径RPC数翻倍；TTL内直接信任上次结果，出错时立即失效
+        self._health_ttl = 1.0
+        self._last_ok_ts = 0.0
+
+        # 操作日志：追加 (lsn, op, payload, collection) 记录。
+        # 目录按实例命名空间隔离（主库集合名+整条拓扑的摘要）：不同
+        # 集合/后端组合的实例各写各的日志，不会把彼此独立的LSN序列
+        # 交错进同一文件、再把记录回放进别人的备份
+        topology = "|".join(
+            f"{type(store).__name__}:{getattr(store, 'collection_name', '')}"
+            for store in (primary, *backups)
+        )
+        namespace = "{}_{}".format(
+            getattr(primary, "collection_name", "default"),
+            hashlib.sha1(topology.encode("utf-8")).hexdigest()[:8],
+        )
+        self._wal_dir = _WAL_ROOT / namespace
+        self._wal_dir.mkdir(parents=True, exist_ok=True)
+
+        # 进程间互斥：同一命名空间同时只允许一个进程当复制者，
+        # 否则两个进程会交错分配LSN并重复回放。锁随进程退出自动释放
+        self._wal_lock_file = open(self._wal_dir / "wal.lock", "a")
+        try:
+            fcntl.flock(self._wal_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._wal_lock_file.close()
+            raise VectorStoreError(
+                f"WAL目录 {self._wal_dir} 已被其他进程持有，"
+                "同一集合拓扑同时只能有一个HA实例写复制日志"
+            )
+
+        self._wal_path = self._wal_dir / "ops.wal"
+        self._wal_lock = threading.Lock()
+        self._next_lsn = self._recover_next_lsn()
+        self._wal_file = open(self._wal_path, "ab")
+
+        # 每个备份一个复制线程，各自维护已应用LSN和对应的日志字节
+        # 偏移（进程内+磁盘侧写）：回放从偏移处直接续读，追平的备份
+        # 不再反复从头反序列化整个日志
+        applied = [self._read_applied(i) for i in range(len(backups))]
+        # 日志被压实后重启时LSN从0重新分配，侧写里的旧进度可能超过
+        # 当前日志尾；按日志实际范围收口，防止新记录被误判为已应用
+        wal_size = self._wal_path.stat().st_size if self._wal_path.exists() else 0
+        self._applied_lsns = [min(lsn, self._next_lsn - 1) for lsn, _ in applied]
+        self._wal_offsets = [min(offset, wal_size) for _, offset in applied]
+        self._wakeups = [threading.Event() for _ in backups]
+        self._replicators = []
+        for i, backup in enumerate(backups):
+            thread = threading.Thread(
+                target=self._replicate_loop,
+                args=(i, backup),
+                name=f"vs-repl-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._replicators.append(thread)
+
+    # ------------------------------------------------------------------
+    # 操作日志
+    # ------------------------------------------------------------------
+
+    def _recover_next_lsn(self) -> int:
+        """启动时扫描日志尾部，恢复下一个LSN（仅启动付一次全量扫描）"""
+        last = -1
+        for (lsn, _, _, _), _ in self._iter_wal(0):
+            last = lsn
+        return last + 1
+
+    def _iter_wal(self, from_offset: int):
+        """从指定字节偏移顺序读日志，产出(记录, 记录结束偏移)"""
+        if not self._wal_path.exists():
+            return
+        with open(self._wal_path, "rb") as f:
+            f.seek(from_offset)
+            offset = from_offset
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    return
+                (length,) = _RECORD_HEADER.unpack(header)
+                blob = f.read(length)
+                if len(blob) < length:
+                    return  # 尾部不完整记录（写入中途崩溃），忽略
+                offset += _RECORD_HEADER.size + length
+                yield pickle.loads(blob), offset
+
+    def _append_wal(self, op: str, payload, collection_name: Optional[str]) -> int:
+        """追加一条操作记录并落盘，返回其LSN"""
+        with self._wal_lock:
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            blob = pickle.dumps(
+                (lsn, op, payload, collection_name),
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+            self._wal_file.write(_RECORD_HEADER.pack(len(blob)) + blob)
+            self._wal_file.flush()
+            os.fsync(self._wal_file.fileno())
+        for wakeup in self._wakeups:
+            wakeup.set()
+        return lsn
+
+    def _lsn_sidecar(self, index: int) -> Path:
+        """备份复制进度的侧写文件路径"""
+        return self._wal_dir / f"backup_{index}.lsn"
+
+    def _read_applied(self, index: int) -> tuple:
+        """读取备份上次应用到的(LSN, 日志字节偏移)（无记录时为(-1, 0)）
+
+        兼容旧格式（只有LSN一个数）：偏移回退为0，首轮回放靠LSN过滤
+        跳过已应用的记录，之后按新格式持久化。
+        """
+        try:
+            parts = self._lsn_sidecar(index).read_text().split()
+            lsn = int(parts[0])
+            offset = int(parts[1]) if len(parts) > 1 else 0
+            return lsn, offset
+        except (FileNotFoundError, ValueError, IndexError):
+            return -1, 0
+
+    def _persist_applied(self, index: int) -> None:
+        """持久化备份的已应用LSN和日志偏移（调用方需持有_wal_lock）"""
+        self._lsn_sidecar(index).write_text(
+            f"{self._applied_lsns[index]} {self._wal_offsets[index]}"
+        )
+
+    def _replicate_loop(self, index: int, backup: VectorStore) -> None:
+        """单个备份的复制线程：从字节偏移续读回放，失败退避后重试"""
+        backoff = 1.0
+        while True:
+            try:
+                progressed = False
+                with self._wal_lock:
+                    start = self._wal_offsets[index]
+                for (lsn, op, payload, collection_name), end in self._iter_wal(start):
+                    if lsn <= self._applied_lsns[index]:
+                        # 旧格式侧写偏移为0时重扫到的已应用记录，只推进偏移
+                        with self._wal_lock:
+                            self._wal_offsets[index] = end
+                        continue
+                    if op == "add":
+                        backup.add_documents(payload, collection_name)
+                    elif op == "delete":
+                        backup.delete(payload, collection_name)
+                    with self._wal_lock:
+                        self._applied_lsns[index] = lsn
+                        self._wal_offsets[index] = end
+                        self._persist_applied(index)
+                    progressed = True
+                if progressed:
+                    backoff = 1.0
+                    self._maybe_compact()
+            except Exception as e:
+                logger.warning(f"备份 {index} 复制失败（LSN {self._applied_lsns[index] + 1}），{backoff:.0f}s后重试: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            self._wakeups[index].wait(timeout=1.0)
+            self._wakeups[index].clear()
+
+    def _maybe_compact(self) -> None:
+        """所有备份都追平时截断日志，防止嵌入历史无限增长
+
+        只在全部已应用LSN等于日志尾LSN时触发：此时没有复制线程还有
+        未回放的记录，截断后各偏移归零；LSN序列保持单调继续递增。
+        """
+        with self._wal_lock:
+            target = self._next_lsn - 1
+            if target < 0 or any(applied < target for applied in self._applied_lsns):
+                return
+            self._wal_file.truncate(0)
+            self._wal_file.seek(0)
+            for i in range(len(self.backups)):
+                self._wal_offsets[i] = 0
+                self._persist_applied(i)
+            logger.debug(f"WAL已压实（截至LSN {target}）")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待所有备份追上当前日志末尾（批量导入结束或退出前调用）
+
+        Args:
+            timeout: 最长等待秒数，None表示一直等
+
+        Returns:
+            bool: 是否全部追上
+        """
+        target = self._next_lsn - 1
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(applied < target for applied in self._applied_lsns):
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def mark_unhealthy(self) -> None:
+        """让健康缓存立即过期（包装调用捕获到异常时使用）"""
+        self._last_ok_ts = 0.0
+
     def _get_available_store(self) -> VectorStore:
-        """获取可用的数据库（故障转移）"""
+        """获取可用的数据库（故障转移，探测结果在TTL内复用）"""
+        now = time.monotonic()
+        if now - self._last_ok_ts < self._health_ttl:
+            return self.current_store
+
         if self.current_store.health_check():
+            self._last_ok_ts = now
             return self.current_store
-        
+
         # 尝试切换到备份
         for backup in self.backups:
             if backup.health_check():
                 logger.warning(f"主数据库不可用，切换到备份: {backup}")
                 self.current_store = backup
+                self._last_ok_ts = time.monotonic()
                 return backup
-        
+
         # 如果主数据库和备份都不可用，尝试恢复主数据库
         if self.primary.health_check():
             logger.info("主数据库已恢复")
             self.current_store = self.primary
+            self._last_ok_ts = time.monotonic()
             return self.primary
-        
+
         raise Exception("所有向量数据库都不可用")
-    
+
     def initialize(self) -> bool:
-        """初始化所有数据库"""
-        results = []
-        try:
-            results.append(self.primary.initialize())
-        except Exception as e:
-            logger.error(f"初始化主数据库失败: {e}")
-            results.append(False)
-        
-        for backup in self.backups:
-            try:
-                results.append(backup.initialize())
-            except Exception as e:
-                logger.error(f"初始化备份数据库失败: {e}")
-                results.append(False)
-        
+        """初始化所有数据库（并发执行，墙钟时间为最慢一个而非总和）"""
+        stores = [self.primary, *self.backups]
+        with ThreadPoolExecutor(max_workers=len(stores)) as pool:
+            futures = [pool.submit(store.initialize) for store in stores]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"初始化数据库失败: {e}")
+                    results.append(False)
         return any(results)
-    
+
     def add_documents(
         self,
         chunks: List[DocumentChunk],
         collection_name: Optional[str] = None
     ) -> List[str]:
-        """添加文档（写入主数据库和备份）"""
+        """添加文档（先记日志，再写主库；备份由复制线程回放）"""
+        if self.backups:
+            self._append_wal("add", chunks, collection_name)
         store = self._get_available_store()
-        result = store.add_documents(chunks, collection_name)
-        
-        # 异步复制到备份（简化实现，实际应该异步）
-        for backup in self.backups:
-            try:
-                if backup.health_check():
-                    backup.add_documents(chunks, collection_name)
-            except Exception as e:
-                logger.warning(f"复制到备份失败: {e}")
-        
-        return result
-    
+        return store.add_documents(chunks, collection_name)
+
     def search(
         self,
         query_embedding: List[float],
@@ -88,33 +312,75 @@ class HighAvailabilityVectorStore(VectorStore):
         filter_dict: Optional[Dict[str, Any]] = None,
         collection_name: Optional[str] = None
     ) -> List[SearchResult]:
-        """搜索（从当前可用数据库读取）"""
+        """搜索（从当前可用数据库读取，失败时失效健康缓存并重试一次）
+
+        开启对冲时，同一查询并发发给主库和首个备份，谁先成功用谁：
+        代价是读放大一倍，换来P99不再被单节点的GC/压缩尖刺拖住。
+        """
+        if self._hedge_pool is not None:
+            return self._hedged_search(query_embedding, top_k, filter_dict, collection_name)
+
         store = self._get_available_store()
-        return store.search(query_embedding, top_k, filter_dict, collection_name)
-    
+        try:
+            return store.search(query_embedding, top_k, filter_dict, collection_name)
+        except Exception as e:
+            logger.warning(f"搜索失败，触发故障转移重试: {e}")
+            self.mark_unhealthy()
+            store = self._get_available_store()
+            return store.search(query_embedding, top_k, filter_dict, collection_name)
+
+    def _hedged_search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        filter_dict: Optional[Dict[str, Any]],
+        collection_name: Optional[str]
+    ) -> List[SearchResult]:
+        """对冲检索：主库+首个备份并发，返回最先到达的成功结果"""
+        pending = {
+            self._hedge_pool.submit(
+                store.search, query_embedding, top_k, filter_dict, collection_name
+            )
+            for store in (self.primary, self.backups[0])
+        }
+        last_error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+        raise VectorStoreError(f"对冲检索全部失败: {last_error}")
+
     def delete(
         self,
         ids: List[str],
         collection_name: Optional[str] = None
     ) -> bool:
-        """删除文档"""
+        """删除文档（同样先记日志再删主库）"""
+        if self.backups:
+            self._append_wal("delete", ids, collection_name)
         store = self._get_available_store()
-        result = store.delete(ids, collection_name)
-        
-        # 同步删除备份
-        for backup in self.backups:
-            try:
-                if backup.health_check():
-                    backup.delete(ids, collection_name)
-            except Exception as e:
-                logger.warning(f"从备份删除失败: {e}")
-        
-        return result
-    
+        return store.delete(ids, collection_name)
+
     def health_check(self) -> bool:
-        """健康检查"""
-        return self.primary.health_check() or any(b.health_check() for b in self.backups)
-    
+        """健康检查（并发探测所有节点，任意一个健康即返回）
+
+        串行探测时挂掉的主库会先吃满自己的超时才轮到备份；
+        并发后首个True立即返回，最坏也只等最慢的一个探测。
+        """
+        stores = [self.primary, *self.backups]
+        with ThreadPoolExecutor(max_workers=len(stores)) as pool:
+            futures = [pool.submit(store.health_check) for store in stores]
+            for future in as_completed(futures):
+                try:
+                    if future.result():
+                        return True
+                except Exception:
+                    continue
+        return False
+
     def get_collection_info(
         self,
         collection_name: Optional[str] = None
@@ -122,5 +388,3 @@ class HighAvailabilityVectorStore(VectorStore):
         """获取集合信息"""
         store = self._get_available_store()
         return store.get_collection_info(collection_name)
-
-
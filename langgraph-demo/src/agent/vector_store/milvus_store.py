@@ -1,7 +1,14 @@
 """Milvus向量数据库实现"""
 
+import json
 import logging
+import queue
+import time
+from contextlib import contextmanager
+from pathlib import Path
 from typing import List, Dict, Any, Optional
+
+import numpy as np
 from pymilvus import (
     connections,
     Collection,
@@ -16,6 +23,40 @@ from agent.config import VectorDBConfig
 
 logger = logging.getLogger(__name__)
 
+# text-embedding-3-small维度（与集合schema一致）
+_EMBEDDING_DIM = 1536
+
+# 每个实例的gRPC连接数：单一alias下所有调用挤一条HTTP/2流，
+# 并发检索/写入互相队头阻塞；小池子让RPC真正并行
+_POOL_SIZE = 4
+
+# 允许进过滤表达式的标量字段
+_FILTER_FIELDS = frozenset({"user_id", "doc_type"})
+
+
+def _format_condition(key: str, value: Any) -> str:
+    """单个过滤条件转Milvus布尔表达式（字符串转义，列表转in）"""
+    if isinstance(value, (list, tuple, set)):
+        return f"{key} in {list(value)}"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{key} == {value}"
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'{key} == "{escaped}"'
+
+
+def _build_filter_expr(filter_dict: Dict[str, Any]) -> Optional[str]:
+    """filter_dict -> 布尔表达式字符串（无有效条件时返回None）
+
+    原实现把值直接塞进单引号f-string，值里带引号会拼出非法表达式，
+    也表达不了in列表；这里按值类型分派格式化，一次join产出。
+    """
+    expr = " && ".join(
+        _format_condition(key, value)
+        for key, value in filter_dict.items()
+        if key in _FILTER_FIELDS
+    )
+    return expr or None
+
 
 class MilvusVectorStore(VectorStore):
     """Milvus向量数据库实现"""
@@ -30,30 +71,51 @@ class MilvusVectorStore(VectorStore):
         self.collection_name = config.collection_name
         self._connection_alias = f"milvus_{config.host}_{config.port}"
         self.collection: Optional[Collection] = None
+        self._pool: "queue.Queue[Collection]" = queue.Queue()
         self._connect()
     
     def _connect(self):
-        """连接Milvus"""
+        """连接Milvus（主alias用于DDL，另建连接池aliases承载数据面RPC）"""
         try:
-            connections.connect(
-                alias=self._connection_alias,
-                host=self.config.host,
-                port=self.config.port,
-                timeout=self.config.timeout,
-            )
+            for alias in self._pool_aliases():
+                connections.connect(
+                    alias=alias,
+                    host=self.config.host,
+                    port=self.config.port,
+                    timeout=self.config.timeout,
+                )
             logger.info(f"成功连接到Milvus: {self.config.host}:{self.config.port}")
         except Exception as e:
             logger.error(f"连接Milvus失败: {e}")
             raise VectorStoreError(f"无法连接到Milvus: {e}")
+
+    def _pool_aliases(self) -> List[str]:
+        """主alias + 池内各连接的alias"""
+        return [self._connection_alias] + [
+            f"{self._connection_alias}_{i}" for i in range(_POOL_SIZE)
+        ]
+
+    @contextmanager
+    def _borrow(self):
+        """从连接池借出一个Collection句柄（用完归还）"""
+        if not self.collection:
+            self.initialize()
+        collection = self._pool.get()
+        try:
+            yield collection
+        finally:
+            self._pool.put(collection)
     
     def initialize(self) -> bool:
-        """初始化集合"""
+        """初始化集合（幂等：重复调用不再走DDL往返）"""
+        if self.collection is not None:
+            return True
         try:
             # 定义字段
             fields = [
                 FieldSchema(name="id", dtype=DataType.VARCHAR, is_primary=True, max_length=100),
                 FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-                FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=1536),
+                FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=_EMBEDDING_DIM),
                 FieldSchema(name="user_id", dtype=DataType.VARCHAR, max_length=100),
                 FieldSchema(name="doc_type", dtype=DataType.VARCHAR, max_length=50),
             ]
@@ -79,16 +141,29 @@ class MilvusVectorStore(VectorStore):
                 )
                 logger.info(f"创建集合: {self.collection_name}")
             
-            # 创建索引
-            index_params = {
-                "metric_type": "COSINE",
-                "index_type": "IVF_FLAT",
-                "params": {"nlist": 1024}
-            }
-            self.collection.create_index(
-                field_name="embedding",
-                index_params=index_params
-            )
+            # 创建索引（已有索引时create_index是次无谓的DDL往返）
+            if not self.collection.has_index():
+                index_params = {
+                    "metric_type": "COSINE",
+                    "index_type": "IVF_FLAT",
+                    "params": {"nlist": 1024}
+                }
+                self.collection.create_index(
+                    field_name="embedding",
+                    index_params=index_params
+                )
+
+            # 初始化时load一次：load把段加载进查询节点内存，是秒级操作，
+            # 放在读路径上每次都付一遍；集合常驻内存后search直接可用
+            self.collection.load()
+
+            # 集合就绪后填充连接池：每个池内alias各持一个Collection句柄
+            if self._pool.empty():
+                for i in range(_POOL_SIZE):
+                    self._pool.put(Collection(
+                        name=self.collection_name,
+                        using=f"{self._connection_alias}_{i}",
+                    ))
             
             return True
             
@@ -103,34 +178,46 @@ class MilvusVectorStore(VectorStore):
     ) -> List[str]:
         """添加文档"""
         collection_name = collection_name or self.collection_name
-        
-        if not self.collection:
-            self.initialize()
-        
+
         try:
-            ids = []
-            contents = []
-            embeddings = []
-            user_ids = []
-            doc_types = []
-            
-            for chunk in chunks:
-                if chunk.embedding is None:
-                    continue
-                
-                ids.append(chunk.id)
-                contents.append(chunk.content)
-                embeddings.append(chunk.embedding)
-                user_ids.append(chunk.metadata.get("user_id", ""))
-                doc_types.append(chunk.metadata.get("doc_type", ""))
-            
-            if not ids:
+            valid = [chunk for chunk in chunks if chunk.embedding is not None]
+            if not valid:
                 return []
+
+            # 行转列一次完成：zip(*...)把分块解包成五个字段序列，嵌入
+            # 再整体转成连续float32矩阵——list[list[float]]要让pymilvus
+            # 逐元素拆装箱序列化，矩阵整块走缓冲区，体积也比Python float减半
+            ids, contents, embeddings, user_ids, doc_types = zip(*(
+                (
+                    chunk.id,
+                    chunk.content,
+                    chunk.embedding,
+                    chunk.metadata.get("user_id", ""),
+                    chunk.metadata.get("doc_type", ""),
+                )
+                for chunk in valid
+            ))
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            ids = list(ids)
             
-            data = [ids, contents, embeddings, user_ids, doc_types]
-            self.collection.insert(data)
-            self.collection.flush()
-            
+            # 分批insert：每批一次gRPC调用。不在每次写入后flush——
+            # flush强制封存WAL/段，代价应摊到整个导入而不是每个批次
+            batch_size = self.config.insert_batch_size
+            with self._borrow() as collection:
+                for start in range(0, len(ids), batch_size):
+                    end = start + batch_size
+                    collection.insert([
+                        ids[start:end],
+                        contents[start:end],
+                        embeddings[start:end],
+                        user_ids[start:end],
+                        doc_types[start:end],
+                    ])
+
+                if self.config.auto_flush:
+                    collection.flush()
+
+            self._invalidate_search_cache()
             logger.info(f"成功添加 {len(ids)} 个文档")
             return ids
             
@@ -138,6 +225,79 @@ class MilvusVectorStore(VectorStore):
             logger.error(f"添加文档失败: {e}")
             raise VectorStoreError(f"添加文档失败: {e}")
     
+    def flush(self) -> None:
+        """显式落盘（批量导入结束后调用一次，摊薄每次flush的封存开销）"""
+        if self.collection:
+            self.collection.flush()
+
+    def bulk_add_documents(
+        self,
+        chunks: List[DocumentChunk],
+        staging_dir: str,
+        poll_interval: float = 2.0,
+        timeout: float = 600.0
+    ) -> bool:
+        """大批量导入：写JSON行文件走bulk_insert，绕开流式写入的WAL
+
+        流式insert每批都过WAL和增量段；bulk_insert由Milvus直接从
+        对象存储构建封存段，大体量导入吞吐明显更高。staging_dir需是
+        Milvus可见的导入路径（挂载卷或已同步到其对象存储的前缀）。
+
+        Args:
+            chunks: 文档分块列表（需已带嵌入）
+            staging_dir: 导入文件落盘目录
+            poll_interval: 任务状态轮询间隔（秒）
+            timeout: 等待导入完成的上限（秒）
+
+        Returns:
+            bool: 导入是否完成
+        """
+        if not self.collection:
+            self.initialize()
+
+        rows = [
+            {
+                "id": chunk.id,
+                "content": chunk.content,
+                "embedding": list(chunk.embedding),
+                "user_id": chunk.metadata.get("user_id", ""),
+                "doc_type": chunk.metadata.get("doc_type", ""),
+            }
+            for chunk in chunks
+            if chunk.embedding is not None
+        ]
+        if not rows:
+            return True
+
+        staging = Path(staging_dir)
+        staging.mkdir(parents=True, exist_ok=True)
+        file_path = staging / f"bulk_{int(time.time())}.json"
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows}, f, ensure_ascii=False)
+
+        task_id = utility.do_bulk_insert(
+            collection_name=self.collection_name,
+            files=[str(file_path)],
+            using=self._connection_alias,
+        )
+        logger.info(f"bulk_insert任务已提交: {task_id}，共 {len(rows)} 行")
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            state = utility.get_bulk_insert_state(
+                task_id=task_id, using=self._connection_alias
+            )
+            if state.state_name in ("ImportCompleted", "ImportFailed"):
+                ok = state.state_name == "ImportCompleted"
+                (logger.info if ok else logger.error)(
+                    f"bulk_insert任务 {task_id} 结束: {state.state_name}"
+                )
+                return ok
+            time.sleep(poll_interval)
+
+        logger.error(f"bulk_insert任务 {task_id} 等待超时")
+        return False
+
     def search(
         self,
         query_embedding: List[float],
@@ -146,30 +306,28 @@ class MilvusVectorStore(VectorStore):
         collection_name: Optional[str] = None
     ) -> List[SearchResult]:
         """向量搜索"""
-        if not self.collection:
-            self.initialize()
-        
+        cache_key = self._search_cache_key(
+            query_embedding, top_k, filter_dict, collection_name or self.collection_name
+        )
+        cached = self._search_cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             # 构建过滤表达式
-            expr = None
-            if filter_dict:
-                conditions = []
-                for key, value in filter_dict.items():
-                    if key in ["user_id", "doc_type"]:
-                        conditions.append(f"{key} == '{value}'")
-                if conditions:
-                    expr = " && ".join(conditions)
+            expr = _build_filter_expr(filter_dict) if filter_dict else None
             
             search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
             
-            results = self.collection.search(
-                data=[query_embedding],
-                anns_field="embedding",
-                param=search_params,
-                limit=top_k,
-                expr=expr,
-                output_fields=["content", "user_id", "doc_type"],
-            )
+            with self._borrow() as collection:
+                results = collection.search(
+                    data=[query_embedding],
+                    anns_field="embedding",
+                    param=search_params,
+                    limit=top_k,
+                    expr=expr,
+                    output_fields=["content", "user_id", "doc_type"],
+                )
             
             search_results = []
             for hits in results:
@@ -185,7 +343,8 @@ class MilvusVectorStore(VectorStore):
                     search_results.append(
                         SearchResult(chunk=chunk, score=hit.score)
                     )
-            
+
+            self._search_cache_put(cache_key, search_results)
             return search_results
             
         except Exception as e:
@@ -198,13 +357,15 @@ class MilvusVectorStore(VectorStore):
         collection_name: Optional[str] = None
     ) -> bool:
         """删除文档"""
-        if not self.collection:
-            self.initialize()
-        
         try:
-            expr = f'id in {ids}'
-            self.collection.delete(expr)
-            self.collection.flush()
+            # id是VARCHAR主键，用json.dumps生成合法的带引号列表字面量；
+            # 超长in列表会撑爆单条表达式，按1000个一批分批删。
+            # 不在删除后flush——删除先落WAL即可见，封存交给显式flush()
+            with self._borrow() as collection:
+                for start in range(0, len(ids), 1000):
+                    expr = f'id in {json.dumps(ids[start:start + 1000])}'
+                    collection.delete(expr)
+            self._invalidate_search_cache()
             logger.info(f"成功删除 {len(ids)} 个文档")
             return True
         except Exception as e:
@@ -230,9 +391,8 @@ class MilvusVectorStore(VectorStore):
             if not utility.has_collection(collection_name):
                 return {"name": collection_name, "error": "集合不存在"}
             
+            # num_entities只读元数据，不需要把集合load进查询节点
             collection = Collection(name=collection_name, using=self._connection_alias)
-            collection.load()
-            
             stats = collection.num_entities
             return {
                 "name": collection_name,
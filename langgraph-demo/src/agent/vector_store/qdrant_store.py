@@ -1,5 +1,6 @@
 """Qdrant向量数据库实现"""
 
+import functools
 import logging
 from typing import List, Dict, Any, Optional
 from qdrant_client import QdrantClient
@@ -10,6 +11,12 @@ from qdrant_client.models import (
     Filter,
     FieldCondition,
     MatchValue,
+    PayloadSchemaType,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
 )
 
 from agent.vector_store.base import VectorStore, VectorStoreError, DocumentChunk, SearchResult
@@ -18,6 +25,19 @@ from agent.config import VectorDBConfig
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=256)
+def _compile_filter(items: tuple) -> Filter:
+    """把排序后的过滤项元组编译成Filter并缓存
+
+    RAG负载下过滤形状高度重复（基本只有user_id一种）；缓存后每次
+    检索不再重建FieldCondition/Filter这些pydantic模型实例。
+    """
+    return Filter(must=[
+        FieldCondition(key=key, match=MatchValue(value=value))
+        for key, value in items
+    ])
+
+
 class QdrantVectorStore(VectorStore):
     """Qdrant向量数据库实现"""
     
@@ -51,17 +71,45 @@ class QdrantVectorStore(VectorStore):
             collection_names = [col.name for col in collections]
             
             if self.collection_name not in collection_names:
+                # int8标量量化：FP32向量6KB/条，全量扫描受内存带宽限制；
+                # 量化码本常驻内存做粗排，原始向量只为top候选做精排复核
+                quantization_config = None
+                if self.config.quantization == "int8":
+                    quantization_config = ScalarQuantization(
+                        scalar=ScalarQuantizationConfig(
+                            type=ScalarType.INT8,
+                            # 按99分位截断量化区间，极端离群值不再拉伸
+                            # int8动态范围，其余向量保留更多精度
+                            quantile=0.99,
+                            always_ram=True,
+                        ),
+                    )
+
                 self.client.create_collection(
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
                         size=1536,  # text-embedding-3-small维度
                         distance=Distance.COSINE,
                     ),
+                    quantization_config=quantization_config,
                 )
-                logger.info(f"创建集合: {self.collection_name}")
+                logger.info(f"创建集合: {self.collection_name}（量化: {self.config.quantization}）")
             else:
                 logger.info(f"集合已存在: {self.collection_name}")
-            
+
+            # user_id上建payload索引：检索按租户预过滤，没有索引时
+            # Qdrant要在HNSW遍历中逐点读payload比对，索引后直接按
+            # 倒排集合收窄候选，过滤开销与命中数成正比而非全集
+            try:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name="user_id",
+                    field_schema=PayloadSchemaType.KEYWORD,
+                )
+            except Exception as e:
+                # 索引已存在等情况不影响使用
+                logger.debug(f"创建user_id索引跳过: {e}")
+
             return True
         except Exception as e:
             logger.error(f"初始化集合失败: {e}")
@@ -76,7 +124,15 @@ class QdrantVectorStore(VectorStore):
         collection = collection_name or self.collection_name
         
         try:
-            points = [
+            ids = [chunk.id for chunk in chunks if chunk.embedding is not None]
+            if not ids:
+                return []
+
+            # 点用生成器惰性构造，upload_points按批次切分并用多worker
+            # 并行推送：单次upsert是一条同步gRPC消息，写入速率受限于
+            # 单连接往返；多worker分摊批次后吞吐随并行度扩展。
+            # wait=False让服务端异步提交，不阻塞在每批落盘上
+            points_iter = (
                 PointStruct(
                     id=chunk.id,
                     vector=chunk.embedding,
@@ -87,18 +143,20 @@ class QdrantVectorStore(VectorStore):
                 )
                 for chunk in chunks
                 if chunk.embedding is not None
-            ]
-            
-            if not points:
-                return []
-            
-            self.client.upsert(
+            )
+
+            self.client.upload_points(
                 collection_name=collection,
-                points=points,
+                points=points_iter,
+                batch_size=self.config.insert_batch_size,
+                parallel=self.config.upload_parallel,
+                max_retries=3,
+                wait=False,
             )
+            self._invalidate_search_cache()
             
-            logger.info(f"成功添加 {len(points)} 个文档到 {collection}")
-            return [chunk.id for chunk in chunks if chunk.embedding is not None]
+            logger.info(f"成功添加 {len(ids)} 个文档到 {collection}")
+            return ids
             
         except Exception as e:
             logger.error(f"添加文档失败: {e}")
@@ -109,45 +167,78 @@ class QdrantVectorStore(VectorStore):
         query_embedding: List[float],
         top_k: int = 5,
         filter_dict: Optional[Dict[str, Any]] = None,
-        collection_name: Optional[str] = None
+        collection_name: Optional[str] = None,
+        payload_fields: Optional[List[str]] = None
     ) -> List[SearchResult]:
-        """向量搜索"""
+        """向量搜索
+
+        Args:
+            query_embedding: 查询向量
+            top_k: 返回top k个结果
+            filter_dict: 过滤条件
+            collection_name: 集合名称
+            payload_fields: 只取这些payload键（None表示全部）——content
+                可达几十KB，只要元数据的调用方用白名单能省大量传输
+
+        Returns:
+            List[SearchResult]: 检索结果列表
+        """
         collection = collection_name or self.collection_name
-        
+
+        # 结果缓存只覆盖取全部payload的常规检索；payload投影的结果
+        # 形状不同，混存会让后续调用拿到裁剪过的payload
+        cache_key = None
+        if payload_fields is None:
+            cache_key = self._search_cache_key(
+                query_embedding, top_k, filter_dict, collection
+            )
+            cached = self._search_cache_get(cache_key)
+            if cached is not None:
+                return cached
+
         try:
-            # 构建过滤条件
-            query_filter = None
-            if filter_dict:
-                conditions = []
-                for key, value in filter_dict.items():
-                    conditions.append(
-                        FieldCondition(
-                            key=key,
-                            match=MatchValue(value=value)
-                        )
-                    )
-                query_filter = Filter(must=conditions) if conditions else None
-            
+            # 构建过滤条件（按过滤形状缓存编译好的Filter）
+            query_filter = (
+                _compile_filter(tuple(sorted(filter_dict.items()))) if filter_dict else None
+            )
+
+            # 量化开启时用int8码本粗排并超采样2倍候选，再用原始FP32
+            # 向量精排复核，补回量化损失的召回
+            search_params = None
+            if self.config.quantization == "int8":
+                search_params = SearchParams(
+                    quantization=QuantizationSearchParams(
+                        rescore=True,
+                        oversampling=2.0,
+                    ),
+                )
+
             results = self.client.search(
                 collection_name=collection,
                 query_vector=query_embedding,
                 limit=top_k,
                 query_filter=query_filter,
+                search_params=search_params,
+                with_payload=payload_fields if payload_fields is not None else True,
+                with_vectors=True,  # 聚合阶段用向量做近重复去重
             )
             
             search_results = []
             for result in results:
-                payload = result.payload
+                # 浅拷贝+pop比逐键比较的字典推导便宜（热路径上每命中一次）
+                metadata = dict(result.payload)
+                content = metadata.pop("content", "")
                 chunk = DocumentChunk(
                     id=str(result.id),
-                    content=payload.get("content", ""),
-                    metadata={k: v for k, v in payload.items() if k != "content"},
-                    embedding=None,
+                    content=content,
+                    metadata=metadata,
+                    embedding=result.vector,
                 )
                 search_results.append(
                     SearchResult(chunk=chunk, score=result.score)
                 )
-            
+
+            self._search_cache_put(cache_key, search_results)
             return search_results
             
         except Exception as e:
@@ -167,6 +258,7 @@ class QdrantVectorStore(VectorStore):
                 collection_name=collection,
                 points_selector=ids,
             )
+            self._invalidate_search_cache()
             logger.info(f"成功删除 {len(ids)} 个文档")
             return True
         except Exception as e:
@@ -1,8 +1,13 @@
 """Weaviate向量数据库实现"""
 
+import atexit
 import logging
+import re
+import threading
 import uuid as uuid_lib
 from typing import List, Dict, Any, Optional
+
+import numpy as np
 import weaviate
 from weaviate.classes.config import Configure, Property, DataType
 from weaviate.classes.query import MetadataQuery
@@ -12,6 +17,34 @@ from agent.config import VectorDBConfig, config
 
 logger = logging.getLogger(__name__)
 
+# schema内建字段，拷贝额外元数据时跳过（frozenset哈希查找在C层完成）
+_RESERVED_PROPS = frozenset({"user_id", "doc_type", "doc_id", "chunk_index"})
+
+# 标准UUID字符串形状（上传路径的chunk.id都由uuid4生成，几乎总命中）
+_UUID_RE = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.I
+)
+
+# 进程级客户端缓存：每个(host, port, api_key)只握手一次。上传路径和
+# 测试脚本每次实例化store都新建客户端，意味着重复付gRPC+HTTP建连；
+# 缓存后新实例直接复用已建好的通道
+_CLIENT_CACHE: Dict[tuple, "weaviate.WeaviateClient"] = {}
+_client_cache_lock = threading.Lock()
+
+
+def _shutdown_clients() -> None:
+    """进程退出时关闭所有缓存的客户端"""
+    with _client_cache_lock:
+        for client in _CLIENT_CACHE.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _CLIENT_CACHE.clear()
+
+
+atexit.register(_shutdown_clients)
+
 
 class WeaviateVectorStore(VectorStore):
     """Weaviate向量数据库实现"""
@@ -25,72 +58,115 @@ class WeaviateVectorStore(VectorStore):
         self.config = config
         self.client: Optional[weaviate.WeaviateClient] = None
         self.class_name = config.collection_name
+        # collections.get每次都重建包装并校验schema，按集合名memoize
+        self._collections: Dict[str, Any] = {}
         self._initialize_client()
     
     def _initialize_client(self):
-        """初始化Weaviate客户端"""
+        """获取Weaviate客户端（进程内按连接参数复用，双重检查锁建连）"""
+        key = (self.config.host, self.config.port, self.config.api_key)
+        client = _CLIENT_CACHE.get(key)
+        if client is None:
+            with _client_cache_lock:
+                client = _CLIENT_CACHE.get(key)
+                if client is None:
+                    client = self._connect()
+                    _CLIENT_CACHE[key] = client
+        self.client = client
+
+    def _connect(self) -> "weaviate.WeaviateClient":
+        """建立新的Weaviate连接"""
+        from weaviate.classes.init import AdditionalConfig, Timeout
+
+        # 分操作设置超时：批量写入（大向量负载）给足2分钟，查询1分钟。
+        # 客户端进程内共享（见_CLIENT_CACHE），HTTP/2长连接保持热态，
+        # 突发的streamlit上传不再每次重付握手和TCP慢启动
+        additional_config = AdditionalConfig(
+            timeout=Timeout(init=10, query=60, insert=120),
+        )
         try:
             # 优先尝试本地连接
             if not self.config.api_key:
-                # 本地连接（无认证）
-                self.client = weaviate.connect_to_local(
+                # 本地连接（无认证）。显式给出gRPC端口：v4客户端有gRPC
+                # 通道时insert_many/near_vector走protobuf，1536维浮点
+                # 负载不再逐元素编码成JSON
+                client = weaviate.connect_to_local(
                     host=self.config.host,
                     port=self.config.port,
+                    grpc_port=self.config.grpc_port,
+                    additional_config=additional_config,
                 )
                 logger.info(f"成功连接到Weaviate本地: {self.config.host}:{self.config.port}")
             else:
                 # 尝试自定义连接
                 try:
-                    self.client = weaviate.connect_to_custom(
+                    client = weaviate.connect_to_custom(
                         http_host=self.config.host,
                         http_port=self.config.port,
                         http_secure=False,
                         grpc_host=self.config.host,
-                        grpc_port=self.config.port + 1000,
+                        grpc_port=self.config.grpc_port,
+                        grpc_secure=False,
                         auth_credentials=weaviate.AuthApiKey(api_key=self.config.api_key),
+                        additional_config=additional_config,
                     )
                     logger.info(f"成功连接到Weaviate自定义: {self.config.host}:{self.config.port}")
                 except Exception:
                     # 如果自定义连接失败，尝试云连接
                     connection_url = f"https://{self.config.host}"
                     if "weaviate.cloud" in self.config.host or self.config.port == 443:
-                        self.client = weaviate.connect_to_wcs(
+                        client = weaviate.connect_to_wcs(
                             cluster_url=connection_url,
                             auth_credentials=weaviate.AuthApiKey(api_key=self.config.api_key),
                         )
                         logger.info(f"成功连接到Weaviate云: {connection_url}")
                     else:
                         raise
+            return client
         except Exception as e:
             logger.error(f"连接Weaviate失败: {e}")
             raise VectorStoreError(f"无法连接到Weaviate: {e}")
     
+    def _coll(self, class_name: str):
+        """取集合句柄（实例级缓存，schema变更由initialize失效）"""
+        collection = self._collections.get(class_name)
+        if collection is None:
+            collection = self.client.collections.get(class_name)
+            self._collections[class_name] = collection
+        return collection
+
     def initialize(self) -> bool:
-        """初始化集合（Class）"""
+        """初始化集合（Class）
+
+        直接create并把"已存在"当成功处理：先exists再create是两次
+        往返，而常态（类早已建好）下带探测的路径每次启动都多付一次RPC。
+        """
         try:
             if not self.client:
                 self._initialize_client()
             
-            # 检查类是否存在
-            if self.client.collections.exists(self.class_name):
+            try:
+                self.client.collections.create(
+                    name=self.class_name,
+                    description="金融文档向量存储类",
+                    vectorizer_config=Configure.Vectorizer.none(),  # 使用外部向量
+                    properties=[
+                        Property(name="content", data_type=DataType.TEXT),
+                        Property(name="user_id", data_type=DataType.TEXT),
+                        Property(name="doc_type", data_type=DataType.TEXT),
+                        Property(name="doc_id", data_type=DataType.TEXT),
+                        Property(name="chunk_index", data_type=DataType.INT),
+                    ],
+                )
+            except weaviate.exceptions.WeaviateBaseError as create_error:
+                if "already exists" not in str(create_error).lower():
+                    raise
                 logger.info(f"类已存在: {self.class_name}")
                 return True
             
-            # 创建类
-            self.client.collections.create(
-                name=self.class_name,
-                description="金融文档向量存储类",
-                vectorizer_config=Configure.Vectorizer.none(),  # 使用外部向量
-                properties=[
-                    Property(name="content", data_type=DataType.TEXT),
-                    Property(name="user_id", data_type=DataType.TEXT),
-                    Property(name="doc_type", data_type=DataType.TEXT),
-                    Property(name="doc_id", data_type=DataType.TEXT),
-                    Property(name="chunk_index", data_type=DataType.INT),
-                ],
-            )
-            
             logger.info(f"创建类: {self.class_name}")
+            # schema刚变化，丢弃旧的集合句柄缓存
+            self._collections.clear()
             return True
             
         except Exception as e:
@@ -109,39 +185,41 @@ class WeaviateVectorStore(VectorStore):
             if not self.client:
                 self._initialize_client()
             
-            collection = self.client.collections.get(class_name)
+            collection = self._coll(class_name)
             
-            # 准备数据对象
-            objects_to_insert = []
+            # 准备数据对象（维度常量提出循环；跳过数用计数器跟踪，
+            # 空结果分支不再重扫一遍chunks）。列式组织：向量集中进一块
+            # 预分配的float32矩阵而非散在各DataObject里——批处理器按行
+            # 切零拷贝视图编码，连续内存对序列化阶段的缓存也更友好
+            expected_dimensions = config.embedding.dimensions
+            vectors = np.empty((len(chunks), expected_dimensions), dtype=np.float32)
+            properties_list = []
+            uuids = []
             inserted_ids = []
+            skipped_no_vec = 0
+            skipped_dim = 0
+            row = 0
             
             for chunk in chunks:
                 if chunk.embedding is None:
                     logger.warning(f"跳过没有向量的文档块: {chunk.id}")
+                    skipped_no_vec += 1
                     continue
                 
                 # 验证向量维度（使用配置中的维度）
-                expected_dimensions = config.embedding.dimensions
                 if len(chunk.embedding) != expected_dimensions:
                     logger.warning(f"文档块 {chunk.id} 的向量维度不正确: {len(chunk.embedding)}, 期望: {expected_dimensions}")
+                    skipped_dim += 1
                     continue
                 
-                # 处理 UUID：确保是有效的 UUID 格式
-                try:
-                    # 尝试将 chunk.id 转换为 UUID
-                    if isinstance(chunk.id, str):
-                        # 如果已经是 UUID 格式，直接使用
-                        try:
-                            chunk_uuid = uuid_lib.UUID(chunk.id)
-                        except ValueError:
-                            # 如果不是有效的 UUID，生成一个新的
-                            chunk_uuid = uuid_lib.uuid4()
-                            logger.debug(f"文档块 ID {chunk.id} 不是有效 UUID，已生成新 UUID: {chunk_uuid}")
-                    else:
-                        chunk_uuid = uuid_lib.uuid4()
-                except Exception as e:
-                    logger.warning(f"处理文档块 ID 失败: {e}，生成新 UUID")
+                # 处理 UUID：正则先验形状再解析，替代逐块try/except——
+                # 上传路径的ID本就是uuid4字符串，异常机制从不触发但
+                # 其搭建成本每块都在付
+                if isinstance(chunk.id, str) and _UUID_RE.match(chunk.id):
+                    chunk_uuid = uuid_lib.UUID(chunk.id)
+                else:
                     chunk_uuid = uuid_lib.uuid4()
+                    logger.debug(f"文档块 ID {chunk.id} 不是有效 UUID，已生成新 UUID: {chunk_uuid}")
                 
                 obj_properties = {
                     "content": chunk.content,
@@ -151,47 +229,52 @@ class WeaviateVectorStore(VectorStore):
                     "chunk_index": chunk.metadata.get("chunk_index", 0),
                 }
                 
-                # 添加其他元数据
-                for key, value in chunk.metadata.items():
-                    if key not in ["user_id", "doc_type", "doc_id", "chunk_index"]:
-                        obj_properties[key] = str(value)
+                # 添加其他元数据（推导式一次update，过滤和赋值都在C层）
+                obj_properties.update({
+                    key: str(value)
+                    for key, value in chunk.metadata.items()
+                    if key not in _RESERVED_PROPS
+                })
                 
-                objects_to_insert.append(
-                    weaviate.classes.data.DataObject(
-                        properties=obj_properties,
-                        vector=chunk.embedding,
-                        uuid=chunk_uuid,
-                    )
-                )
+                vectors[row] = chunk.embedding
+                properties_list.append(obj_properties)
+                uuids.append(chunk_uuid)
                 inserted_ids.append(str(chunk_uuid))
+                row += 1
             
-            if not objects_to_insert:
-                expected_dimensions = config.embedding.dimensions
+            if not uuids:
                 logger.warning(f"没有可插入的文档对象。输入块数: {len(chunks)}, "
-                             f"有效块数: {len([c for c in chunks if c.embedding is not None and len(c.embedding) == expected_dimensions])}")
+                             f"无向量: {skipped_no_vec}, 维度不符: {skipped_dim}")
                 return []
             
-            # 批量插入（分批处理，避免一次性插入太多）
-            batch_size = 100
-            total_inserted = 0
-            
-            for i in range(0, len(objects_to_insert), batch_size):
-                batch = objects_to_insert[i:i + batch_size]
-                try:
-                    collection.data.insert_many(batch)
-                    total_inserted += len(batch)
-                    logger.debug(f"成功插入批次 {i // batch_size + 1}: {len(batch)} 个文档")
-                except Exception as batch_error:
-                    logger.error(f"批次 {i // batch_size + 1} 插入失败: {batch_error}")
-                    # 尝试逐个插入，找出问题文档
-                    for obj in batch:
-                        try:
-                            collection.data.insert(obj)
-                            total_inserted += 1
-                        except Exception as single_error:
-                            logger.error(f"单个文档插入失败: {single_error}, UUID: {obj.uuid}")
+            # 动态批量写入：insert_many逐批同步阻塞在每次RPC上，
+            # dynamic批处理器多线程并发发送并自适应批大小，序列化、
+            # 网络和服务端建索引三段流水重叠
+            with collection.batch.dynamic() as batch:
+                for i in range(row):
+                    batch.add_object(
+                        properties=properties_list[i],
+                        vector=vectors[i],  # 矩阵行的零拷贝float32视图
+                        uuid=uuids[i],
+                    )
+
+            total_inserted = row
+            failed_objects = collection.batch.failed_objects
+            if failed_objects:
+                # 失败对象逐个重试，便于定位问题文档
+                total_inserted -= len(failed_objects)
+                for failed in failed_objects:
+                    try:
+                        collection.data.insert(
+                            properties=failed.object_.properties,
+                            vector=failed.object_.vector,
+                            uuid=failed.object_.uuid,
+                        )
+                        total_inserted += 1
+                    except Exception as single_error:
+                        logger.error(f"单个文档插入失败: {single_error}, UUID: {failed.object_.uuid}")
             
-            logger.info(f"成功添加 {total_inserted}/{len(objects_to_insert)} 个文档到 {class_name}")
+            logger.info(f"成功添加 {total_inserted}/{row} 个文档到 {class_name}")
             return inserted_ids[:total_inserted]
             
         except Exception as e:
@@ -203,17 +286,35 @@ class WeaviateVectorStore(VectorStore):
         query_embedding: List[float],
         top_k: int = 5,
         filter_dict: Optional[Dict[str, Any]] = None,
-        collection_name: Optional[str] = None
+        collection_name: Optional[str] = None,
+        return_scores: bool = True
     ) -> List[SearchResult]:
-        """向量搜索"""
+        """向量搜索
+
+        Args:
+            query_embedding: 查询向量
+            top_k: 返回top k个结果
+            filter_dict: 过滤条件
+            collection_name: 集合名称
+            return_scores: 是否需要相似度分数；只要文本的调用方传False
+                可免去每个对象的metadata反序列化
+
+        Returns:
+            List[SearchResult]: 检索结果列表
+        """
         class_name = collection_name or self.class_name
         
         try:
             if not self.client:
                 self._initialize_client()
             
-            collection = self.client.collections.get(class_name)
-            
+            collection = self._coll(class_name)
+
+            # 查询向量转成连续float32数组：v4客户端识别ndarray后按
+            # 原始字节编码发送，省掉1536个Python float的逐元素装箱，
+            # 线上体积也只有protobuf double列表的一半
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+
             # 构建过滤条件（使用 Weaviate v4+ 的 Filter API）
             from weaviate.classes.query import Filter
             
@@ -233,18 +334,17 @@ class WeaviateVectorStore(VectorStore):
                     # 多个条件用 AND 组合
                     where_filter = Filter.all_of(filter_conditions)
             
-            # 执行向量搜索（Weaviate v4+ API）
-            # 注意：在 Weaviate v4 中，near_vector() 不接受 where 参数
-            # 解决方案：先执行向量搜索获取更多结果，然后在 Python 层面过滤
-            
-            # 计算需要获取的候选数量（如果有过滤条件，需要更多候选）
-            candidate_limit = top_k * 5 if where_filter else top_k
-            
-            # 执行向量搜索
+            # 过滤下推到服务端：v4的near_vector接受filters参数，HNSW
+            # 遍历时即按谓词剪枝。此前客户端超采5倍候选再在Python侧
+            # 比对user_id/doc_type，白传5倍候选、召回还受补偿系数摆布
+            # certainty由服务端按(1+cos)/2归一化到[0,1]；取回后映射回
+            # 余弦尺度，与Qdrant/Milvus的打分以及similarity_threshold
+            # 保持同一量纲
             response = collection.query.near_vector(
-                near_vector=query_embedding,
-                limit=candidate_limit,
-                return_metadata=MetadataQuery(distance=True),
+                near_vector=query_vector,
+                limit=top_k,
+                filters=where_filter,
+                return_metadata=MetadataQuery(certainty=True) if return_scores else None,
                 return_properties=["content", "user_id", "doc_type", "doc_id", "chunk_index"],
             )
             
@@ -252,18 +352,6 @@ class WeaviateVectorStore(VectorStore):
             for obj in response.objects:
                 properties = obj.properties
                 
-                # 如果有过滤条件，在 Python 层面进行过滤
-                if where_filter and filter_dict:
-                    # 检查是否匹配过滤条件
-                    match = True
-                    for key, value in filter_dict.items():
-                        if key in ["user_id", "doc_type"]:
-                            if properties.get(key) != str(value):
-                                match = False
-                                break
-                    if not match:
-                        continue  # 跳过不匹配的结果
-                
                 metadata = {
                     "user_id": properties.get("user_id", ""),
                     "doc_type": properties.get("doc_type", ""),
@@ -277,16 +365,11 @@ class WeaviateVectorStore(VectorStore):
                     metadata=metadata,
                 )
                 
-                # 计算相似度分数（Weaviate返回的是距离，需要转换为相似度）
-                distance = obj.metadata.distance if obj.metadata.distance else 1.0
-                score = 1.0 - distance  # 将距离转换为相似度
+                certainty = obj.metadata.certainty if return_scores else None
+                score = 2.0 * certainty - 1.0 if certainty is not None else 0.0
                 
                 search_results.append(SearchResult(chunk=chunk, score=score))
             
-            # 如果有过滤条件，只返回前 top_k 个结果
-            if where_filter:
-                search_results = search_results[:top_k]
-            
             return search_results
             
         except Exception as e:
@@ -305,15 +388,25 @@ class WeaviateVectorStore(VectorStore):
             if not self.client:
                 self._initialize_client()
             
-            collection = self.client.collections.get(class_name)
-            
-            # 批量删除
-            for doc_id in ids:
-                try:
-                    collection.data.delete_by_id(doc_id)
-                except Exception as e:
-                    logger.warning(f"删除文档 {doc_id} 失败: {e}")
-            
+            collection = self._coll(class_name)
+
+            # 一次delete_many按ID集合删除：逐个delete_by_id是N次gRPC
+            # 往返，批量后网络开销与ID数量无关
+            from weaviate.classes.query import Filter
+
+            try:
+                collection.data.delete_many(
+                    where=Filter.by_id().contains_any([str(doc_id) for doc_id in ids])
+                )
+            except Exception as batch_error:
+                # 批量失败时退回逐个删除，便于定位问题ID
+                logger.warning(f"批量删除失败，退回逐个删除: {batch_error}")
+                for doc_id in ids:
+                    try:
+                        collection.data.delete_by_id(doc_id)
+                    except Exception as e:
+                        logger.warning(f"删除文档 {doc_id} 失败: {e}")
+
             logger.info(f"成功删除 {len(ids)} 个文档")
             return True
             
@@ -348,7 +441,7 @@ class WeaviateVectorStore(VectorStore):
             if not self.client.collections.exists(class_name):
                 return {"name": class_name, "error": "类不存在"}
             
-            collection = self.client.collections.get(class_name)
+            collection = self._coll(class_name)
             
             # 获取对象数量
             count_response = collection.aggregate.over_all(total_count=True)
@@ -364,10 +457,6 @@ class WeaviateVectorStore(VectorStore):
             return {"name": class_name, "error": str(e)}
     
     def __del__(self):
-        """关闭连接"""
-        try:
-            if self.client:
-                self.client.close()
-        except Exception:
-            pass
+        """析构不关闭连接——客户端在进程内共享，由atexit统一关闭"""
+        pass
 
@@ -3,13 +3,15 @@
 import streamlit as st
 import os
 import uuid
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
 from pathlib import Path
 
 # 导入项目模块 - 使用 deep-searcher loader
 from agent.data_processor.file_loader import get_file_loader
 from agent.data_processor.text_splitter import get_text_splitter
 from agent.config import config
-from agent.vector_store.factory import VectorStoreFactory
 from agent.vector_store.base import DocumentChunk
 from agent.utils.embedding import generate_embeddings
 from agent.rag.graph import get_rag_graph
@@ -31,85 +33,118 @@ if "user_id" not in st.session_state:
     st.session_state.user_id = str(uuid.uuid4())
 
 
+@st.cache_resource
+def _init_resources():
+    """应用级共享资源：RAG图和已初始化的向量库连接
+
+    cache_resource跨会话、跨rerun共享单例；放在按钮回调里的话，
+    每个会话的首次点击都要现场付图编译+向量库建连的冷启动延迟。
+    """
+    from agent.vector_store.factory import get_vector_store
+
+    return {"graph": get_rag_graph(), "store": get_vector_store()}
+
+
 def process_uploaded_files(uploaded_files):
     """处理已选择的上传文件，将其写入向量数据库"""
     if not uploaded_files:
         st.warning("请先选择要上传的文档。")
         return
 
-    vector_store = VectorStoreFactory.create_vector_store()
-    vector_store.initialize()
+    vector_store = _init_resources()["store"]
 
     progress_bar = st.progress(0)
     status_text = st.empty()
 
+    # 两段式处理：先把所有文件解析分块收集起来，再对全量文本发一次
+    # 嵌入调用、入库一次。逐文件嵌入是N次小批量API往返；合并后请求
+    # 数与文件数无关，向量库也只见一个大批次（HNSW建图局部性更好）
     all_chunks = []
+    all_doc_ids = []
 
-    for idx, uploaded_file in enumerate(uploaded_files):
-        status_text.text(f"正在处理: {uploaded_file.name}")
+    upload_dir = Path(config.upload_dir)
+    upload_dir.mkdir(exist_ok=True)
+    user_id = st.session_state.user_id
 
-        # 保存文件
-        upload_dir = Path(config.upload_dir)
-        upload_dir.mkdir(exist_ok=True)
+    def _parse_one_upload(uploaded_file):
+        """保存、解析并分块单个上传文件（工作线程内执行）"""
         file_path = upload_dir / uploaded_file.name
-
         with open(file_path, "wb") as f:
             f.write(uploaded_file.getbuffer())
 
+        file_loader = get_file_loader()
+        if not file_loader.is_supported(str(file_path)):
+            raise ValueError(f"不支持的文件格式: {uploaded_file.name}")
+
+        doc_data = file_loader.load(str(file_path))
+        doc_id = str(uuid.uuid4())
+        doc_type = uploaded_file.name.split(".")[-1] if "." in uploaded_file.name else "unknown"
+
+        chunks = get_text_splitter().split_documents(
+            content=doc_data,
+            doc_id=doc_id,
+            user_id=user_id,
+            doc_type=doc_type,
+        )
+        return chunks, doc_id
+
+    # 解析阶段并行化：PDF/DOCX解析大部分时间在释放GIL的原生库里，
+    # 多文件用线程池重叠；as_completed驱动进度条，UI更新留在主线程
+    status_text.text(f"正在解析 {len(uploaded_files)} 个文件...")
+    parsed = {}
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        futures = {ex.submit(_parse_one_upload, uf): uf for uf in uploaded_files}
+        done_count = 0
+        for future in as_completed(futures):
+            uploaded_file = futures[future]
+            done_count += 1
+            try:
+                parsed[uploaded_file.name] = future.result()
+            except Exception as e:
+                st.error(f"处理文件 {uploaded_file.name} 失败: {e}")
+            progress_bar.progress(done_count / len(uploaded_files))
+
+    # 按上传顺序合并，保证块顺序稳定
+    for uploaded_file in uploaded_files:
+        result = parsed.get(uploaded_file.name)
+        if result is None:
+            continue
+        chunks, doc_id = result
+        all_chunks.extend(chunks)
+        all_doc_ids.extend([doc_id] * len(chunks))
+
+    if all_chunks:
         try:
-            # 使用 FileLoader 加载文件
-            file_loader = get_file_loader()
-            if not file_loader.is_supported(str(file_path)):
-                st.error(f"不支持的文件格式: {uploaded_file.name}")
-                continue
-            
-            # 加载文件
-            doc_data = file_loader.load(str(file_path))
-            
-            # 使用 TextSplitter 分块
-            text_splitter = get_text_splitter()
-            
-            doc_id = str(uuid.uuid4())
-            doc_type = uploaded_file.name.split(".")[-1] if "." in uploaded_file.name else "unknown"
-            
-            # 分割文档
-            chunks = text_splitter.split_documents(
-                content=doc_data,
-                doc_id=doc_id,
-                user_id=st.session_state.user_id,
-                doc_type=doc_type,
-            )
-
-            # 生成嵌入向量
-            chunk_texts = [chunk["content"] for chunk in chunks]
-            embeddings = generate_embeddings(chunk_texts)
+            # 生成嵌入向量（网络IO为主，按子批并行调用嵌入服务，ex.map保持顺序）
+            status_text.text(f"正在生成 {len(all_chunks)} 个文档块的嵌入向量...")
+            chunk_texts = [chunk["content"] for chunk in all_chunks]
+            if len(chunk_texts) > 64:
+                sub_batches = [chunk_texts[i:i + 64] for i in range(0, len(chunk_texts), 64)]
+                with ThreadPoolExecutor(max_workers=8) as ex:
+                    embeddings = list(chain.from_iterable(ex.map(generate_embeddings, sub_batches)))
+            else:
+                embeddings = generate_embeddings(chunk_texts)
 
             # 创建DocumentChunk对象
             # 使用UUID作为ID，确保Weaviate兼容性
-            document_chunks = []
-            for i, chunk in enumerate(chunks):
-                # 生成唯一的UUID作为ID
-                chunk_uuid = str(uuid.uuid4())
-                document_chunks.append(
-                    DocumentChunk(
-                        id=chunk_uuid,
-                        content=chunk["content"],
-                        metadata={
-                            **chunk["metadata"],
-                            "original_chunk_id": f"{doc_id}_{chunk['metadata']['chunk_index']}",  # 保留原始ID在metadata中
-                        },
-                        embedding=embeddings[i],
-                    )
+            document_chunks = [
+                DocumentChunk(
+                    id=str(uuid.uuid4()),
+                    content=chunk["content"],
+                    metadata={
+                        **chunk["metadata"],
+                        "original_chunk_id": f"{doc_id}_{chunk['metadata']['chunk_index']}",  # 保留原始ID在metadata中
+                    },
+                    embedding=embedding,
                 )
+                for chunk, doc_id, embedding in zip(all_chunks, all_doc_ids, embeddings)
+            ]
 
-            # 插入向量数据库
+            status_text.text("正在写入向量数据库...")
             vector_store.add_documents(document_chunks)
-            all_chunks.extend(chunks)
-
-            progress_bar.progress((idx + 1) / len(uploaded_files))
 
         except Exception as e:
-            st.error(f"处理文件 {uploaded_file.name} 失败: {e}")
+            st.error(f"向量化入库失败: {e}")
 
     status_text.text("处理完成！")
     st.success(f"成功处理 {len(uploaded_files)} 个文件，共 {len(all_chunks)} 个文档块")
@@ -123,81 +158,74 @@ def process_uploaded_files(uploaded_files):
 
 
 def chat_interface():
-    """对话界面（上下布局 + 上传/发送按钮）"""
+    """对话界面（chat_message渲染历史 + chat_input提交）"""
     st.markdown("### 💬 上下文对话")
 
-    # 对话历史区域
-    chat_container = st.container()
-    with chat_container:
-        if not st.session_state.conversation_history:
-            st.info("还没有对话内容，先上传文档或直接开始提问吧。")
-        for i, (question, answer) in enumerate(st.session_state.conversation_history):
-            st.markdown(f"**问：** {question}")
-            st.markdown(f"**答：** {answer}")
-            st.divider()
-
-    st.markdown("---")
-
-    # 下半部分：输入 + 上传 + 按钮
-    with st.container():
-        user_input = st.text_area("在这里输入你的问题：", key="user_query", height=100)
-
-        # 上传控件 + 按钮一行
-        col_upload, col_send = st.columns([1, 1])
-
-        with col_upload:
-            uploaded_files = st.file_uploader(
-                "选择要上传的文档（PDF/DOCX/DOC/PPT/Excel/TXT）",
-                type=["pdf", "docx", "doc", "pptx", "ppt", "xlsx", "xls", "txt"],
-                accept_multiple_files=True,
-                key="chat_uploader",
-            )
-            upload_clicked = st.button("📁 上传并入库", use_container_width=True)
-
-        with col_send:
-            send_clicked = st.button("📨 发送对话", type="primary", use_container_width=True)
-
-    # 处理上传按钮逻辑
-    if upload_clicked:
-        with st.spinner("正在上传并处理文档..."):
-            process_uploaded_files(uploaded_files)
-
-    # 处理发送对话按钮逻辑
-    if send_clicked and user_input:
-        with st.spinner("正在思考..."):
-            try:
-                # 调用RAG图
-                rag_graph = get_rag_graph()
-
-                initial_state = GraphRAGState(
-                    messages=[HumanMessage(content=user_input)],
-                    query=user_input,
-                    user_id=st.session_state.user_id,
-                    retrieved_chunks=[],
-                    retrieval_scores=[],
-                    reflection_result=None,
-                    needs_iteration=False,
-                    iteration_count=0,
-                    refined_query=None,
-                    final_answer=None,
-                    metadata={},
-                )
-
-                result = rag_graph.invoke(initial_state)
-                answer = result.get("final_answer", "抱歉，无法生成答案。")
+    # 历史用原生chat_message渲染：st.markdown两次+divider的手写布局
+    # 每轮三个部件，长会话下每次rerun都做O(N)次DOM diff；chat_message
+    # 走Streamlit内部批量diff，只有新增的尾部真正重绘
+    if not st.session_state.conversation_history:
+        st.info("还没有对话内容，先上传文档或直接开始提问吧。")
+    for question, answer in st.session_state.conversation_history:
+        with st.chat_message("user"):
+            st.markdown(question)
+        with st.chat_message("assistant"):
+            st.markdown(answer)
+
+    # 上传控件
+    with st.expander("📁 上传文档（PDF/DOCX/DOC/PPT/Excel/TXT）"):
+        uploaded_files = st.file_uploader(
+            "选择要上传的文档",
+            type=["pdf", "docx", "doc", "pptx", "ppt", "xlsx", "xls", "txt"],
+            accept_multiple_files=True,
+            key="chat_uploader",
+        )
+        if st.button("上传并入库", use_container_width=True):
+            with st.spinner("正在上传并处理文档..."):
+                process_uploaded_files(uploaded_files)
+
+    # chat_input提交后本轮直接增量渲染新消息，无需整页st.rerun
+    user_input = st.chat_input("在这里输入你的问题：")
+    if user_input:
+        with st.chat_message("user"):
+            st.markdown(user_input)
+        with st.chat_message("assistant"):
+            with st.spinner("正在思考..."):
+                try:
+                    # 调用RAG图（启动时已预热）
+                    rag_graph = _init_resources()["graph"]
+
+                    initial_state = GraphRAGState(
+                        messages=[HumanMessage(content=user_input)],
+                        query=user_input,
+                        user_id=st.session_state.user_id,
+                        retrieved_chunks=[],
+                        retrieval_scores=[],
+                        reflection_result=None,
+                        needs_iteration=False,
+                        iteration_count=0,
+                        refined_query=None,
+                        final_answer=None,
+                        metadata={},
+                    )
 
-                # 保存到历史
-                st.session_state.conversation_history.append((user_input, answer))
+                    # RAG图的LLM节点是协程，需经ainvoke驱动
+                    result = asyncio.run(rag_graph.ainvoke(initial_state))
+                    answer = result.get("final_answer", "抱歉，无法生成答案。")
+                    st.markdown(answer)
 
-                # 刷新页面以展示新对话
-                st.rerun()
+                    # 保存到历史
+                    st.session_state.conversation_history.append((user_input, answer))
 
-            except Exception as e:
-                st.error(f"生成答案失败: {e}")
+                except Exception as e:
+                    st.error(f"生成答案失败: {e}")
 
 
 st.markdown("## 💼 金融图RAG智能问答系统")
 st.caption(f"会话用户 ID：`{st.session_state.user_id[:8]}...`")
 
+# 启动即预热：首个用户交互不再付图编译和向量库握手
+_init_resources()
+
 # 主内容区：上下文对话界面
 chat_interface()
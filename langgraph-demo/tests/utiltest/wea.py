@@ -14,10 +14,12 @@ try:
     #     )
     #
     collection = client.collections.get("FinancialDoc")
+    # 只取content：include_vector=True会为每个对象多传约6KB的1536维
+    # 向量，检查文本内容时纯属浪费带宽
     for item in collection.iterator(
-            include_vector=True
+            return_properties=["content"],
+            include_vector=False,
     ):
         print(item.properties['content'])
-        print(item.vector)
 finally:
     client.close()
\ No newline at end of file